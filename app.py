@@ -1,78 +1,480 @@
 # app.py → HR Insight Bot (FINAL VERSION - PDF WORKS 100%)
 # Run: python app.py
 
-import joblib
-import pandas as pd
+import time
+_BOOT_T0 = time.perf_counter()
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+import collections
+import zipfile
+import hmac
+import uuid
+import queue
+import atexit
+import concurrent.futures
+import multiprocessing
+import importlib
+import subprocess
+import types
+import bisect
+import itertools
+import shutil
 import numpy as np
 import sqlite3
 import datetime
 import io
 import bcrypt
-import openpyxl
-import matplotlib.pyplot as plt
-from fpdf import FPDF
-from flask import Flask, request, render_template_string, session, redirect, url_for, send_file, flash
-from textblob import TextBlob
-from sklearn.decomposition import PCA
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+from flask import Flask, request, render_template, session, redirect, url_for, send_file, flash, jsonify, Response, stream_with_context
+from flask.signals import before_render_template, template_rendered
+from jinja2 import DictLoader
+from werkzeug.utils import secure_filename
 import traceback
+import contextlib
+import click
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+# -------------------------- Lazy Imports --------------------------
+# These libraries take seconds to import and most routes (welcome, login,
+# tasks) never touch them, so each one loads on first attribute access.
+# preload() imports everything up front for `gunicorn --preload`.
+LAZY_IMPORT_SECONDS = {}
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            t0 = time.perf_counter()
+            module = importlib.import_module(self.__name__)
+            LAZY_IMPORT_SECONDS.setdefault(self.__name__, time.perf_counter() - t0)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+pd = LazyModule('pandas')
+joblib = LazyModule('joblib')
+openpyxl = LazyModule('openpyxl')
+textblob = LazyModule('textblob')
+fpdf = LazyModule('fpdf')
+mpl_figure = LazyModule('matplotlib.figure')
+LAZY_MODULES = [pd, joblib, openpyxl, textblob, fpdf, mpl_figure]
 
 app = Flask(__name__)
 app.secret_key = 'hr_insight_bot_2025_secret'
 
+# -------------------------- Metrics --------------------------
+# Fixed-bucket histograms kept per process and rendered in Prometheus text
+# format by /metrics. Observing costs two perf_counter calls, a bisect and
+# a locked increment, and nothing happens between scrapes. HR_METRICS=0
+# turns every timer into a no-op.
+METRICS_ENABLED = os.environ.get('HR_METRICS', '1') != '0'
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_pairs(names, values):
+    return ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+
+class Histogram:
+    def __init__(self, name, doc, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> per-bucket counts (last one is +Inf), then the sum
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for labels, series in items:
+            base = _label_pairs(self.labelnames, labels)
+            sep = ',' if base else ''
+            cumulative = 0
+            for le, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if le == float('inf') else repr(le)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+REQUEST_SECONDS = Histogram('hr_request_duration_seconds', "Request latency by route.", ('route', 'method', 'status'))
+STAGE_SECONDS = Histogram('hr_stage_duration_seconds', "Latency of internal stages (predict, pdf, export, ...).", ('stage',))
+SQLITE_SECONDS = Histogram('hr_sqlite_query_seconds', "SQLite execute/executemany latency by statement type.", ('op',))
+
+class _StageTimer:
+    __slots__ = ('labels', 't0')
+
+    def __init__(self, name):
+        self.labels = (name,)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(self.labels, time.perf_counter() - self.t0)
+
+_NO_TIMER = contextlib.nullcontext()
+
+def stage(name):
+    return _StageTimer(name) if METRICS_ENABLED else _NO_TIMER
+
+@app.before_request
+def _start_request_timer():
+    request.environ['hr.request_t0'] = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    # Streaming responses are timed to their first byte
+    t0 = request.environ.get('hr.request_t0')
+    if METRICS_ENABLED and t0 is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe((route, request.method, str(response.status_code)), time.perf_counter() - t0)
+    return response
+
+def _sql_op(sql):
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'EMPTY'
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_SECONDS.observe((_sql_op(sql),), time.perf_counter() - t0)
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            SQLITE_SECONDS.observe((_sql_op(sql),), time.perf_counter() - t0)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
 # -------------------------- Database --------------------------
+# Every thread gets its own connection (reconnecting after a fork), so
+# concurrent requests never share a cursor. Schema changes after the
+# original tables live in MIGRATIONS, tracked by PRAGMA user_version.
 DB = 'employee_db.db'
-conn = sqlite3.connect(DB, check_same_thread=False)
-c = conn.cursor()
-
-c.execute('''CREATE TABLE IF NOT EXISTS employee (
-             id TEXT PRIMARY KEY, name TEXT, age INT, income INT, sat INT,
-             overtime TEXT, involve INT, feedback TEXT, leaves_taken INT, password_hash TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS task (
-             emp_id TEXT, task TEXT, status TEXT, ts TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS chat (
-             emp_id TEXT, role TEXT, message TEXT, ts TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS applications (
-             id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, designation TEXT,
-             experience TEXT, role TEXT, ts TEXT)''')
-try:
-    c.execute("ALTER TABLE employee ADD COLUMN password_hash TEXT")
-except:
-    pass
-conn.commit()
+_db_local = threading.local()
+
+def _connect():
+    db = sqlite3.connect(DB, timeout=30, factory=TimedConnection if METRICS_ENABLED else sqlite3.Connection)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-16000")
+    return db
+
+def get_db():
+    if getattr(_db_local, 'pid', None) != os.getpid():
+        _db_local.conn = _connect()
+        _db_local.pid = os.getpid()
+    return _db_local.conn
+
+@app.teardown_request
+def _release_db(exc):
+    # A request that failed mid-write must not leave its thread's connection holding a transaction
+    db = getattr(_db_local, 'conn', None)
+    if db is not None and _db_local.pid == os.getpid() and db.in_transaction:
+        db.rollback()
+
+MIGRATIONS = [
+    # 1: indexes for the per-employee task and chat lookups
+    '''CREATE INDEX IF NOT EXISTS idx_task_emp_id ON task (emp_id);
+       CREATE INDEX IF NOT EXISTS idx_chat_emp_id_ts ON chat (emp_id, ts);''',
+    # 2: per-employee dashboard panel versions, bumped in the same transaction as each write
+    '''CREATE TABLE IF NOT EXISTS dashboard_version (
+           emp_id TEXT NOT NULL, panel TEXT NOT NULL, version INTEGER NOT NULL,
+           PRIMARY KEY (emp_id, panel)) WITHOUT ROWID;''',
+    # 3: latest prediction per employee plus materialized risk bucket counts
+    '''CREATE TABLE IF NOT EXISTS employee_risk (
+           emp_id TEXT PRIMARY KEY, attrition_prob REAL NOT NULL, promotion_prob REAL NOT NULL,
+           model_version TEXT, ts TEXT);
+       CREATE INDEX IF NOT EXISTS idx_employee_risk_attrition ON employee_risk (attrition_prob DESC);
+       CREATE TABLE IF NOT EXISTS risk_bucket (
+           metric TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,
+           PRIMARY KEY (metric, bucket)) WITHOUT ROWID;''',
+    # 4: labeled outcomes that background retraining learns from
+    '''CREATE TABLE IF NOT EXISTS employee_outcome (
+           emp_id TEXT PRIMARY KEY, attrited INTEGER NOT NULL, promoted INTEGER NOT NULL, ts TEXT);''',
+    # 5: PDF report jobs, visible to every worker process that may receive the poll
+    '''CREATE TABLE IF NOT EXISTS report_job (
+           id TEXT PRIMARY KEY, emp_id TEXT NOT NULL, status TEXT NOT NULL, pdf BLOB,
+           created REAL NOT NULL, finished REAL);''',
+    # 6: bulk import jobs, so any worker can report an import's progress
+    '''CREATE TABLE IF NOT EXISTS import_job (
+           id TEXT PRIMARY KEY, filename TEXT, status TEXT NOT NULL, imported INTEGER NOT NULL DEFAULT 0,
+           summary TEXT, error TEXT, created REAL NOT NULL, finished REAL);''',
+]
+
+def migrate(db):
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for i, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        db.executescript(script)
+        db.execute(f"PRAGMA user_version = {i}")
+        db.commit()
+
+def init_db():
+    db = get_db()
+    c = db.cursor()
+
+    c.execute('''CREATE TABLE IF NOT EXISTS employee (
+                 id TEXT PRIMARY KEY, name TEXT, age INT, income INT, sat INT,
+                 overtime TEXT, involve INT, feedback TEXT, leaves_taken INT, password_hash TEXT,
+                 feedback_sentiment REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS task (
+                 emp_id TEXT, task TEXT, status TEXT, ts TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS chat (
+                 emp_id TEXT, role TEXT, message TEXT, ts TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS applications (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, designation TEXT,
+                 experience TEXT, role TEXT, ts TEXT)''')
+    try:
+        c.execute("ALTER TABLE employee ADD COLUMN password_hash TEXT")
+    except:
+        pass
+    try:
+        c.execute("ALTER TABLE employee ADD COLUMN feedback_sentiment REAL")
+    except:
+        pass
+    db.commit()
+    migrate(db)
+
+init_db()
+
+EMPLOYEE_COLUMNS = ['id','name','age','income','sat','overtime','involve','feedback','leaves_taken','password_hash','feedback_sentiment']
+EMPLOYEE_SELECT = f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employee WHERE id=?"
+
+def bump_dashboard_versions(db, pairs):
+    db.executemany('''INSERT INTO dashboard_version (emp_id, panel, version) VALUES (?, ?, 1)
+                      ON CONFLICT (emp_id, panel) DO UPDATE SET version = version + 1''', pairs)
+
+def bump_dashboard_version(db, emp_id, *panels):
+    bump_dashboard_versions(db, [(emp_id, panel) for panel in panels])
 
 # -------------------------- Excel Export --------------------------
+# Requests only enqueue rows; export_worker appends them to EXPORT_JOURNAL in
+# batches. compact_export() (run periodically and by `flask --app app
+# compact-export`) streams the journal into the workbook with openpyxl's
+# write-only mode.
 EXCEL_FILE = 'hr_data.xlsx'
+EXPORT_JOURNAL = 'hr_data.journal.jsonl'
+EXPORT_SHEETS = {
+    'Employees': ['emp_id','name','age','income','sat','overtime','involve','feedback','leaves_taken','ts'],
+    'Applicants': ['name','designation','experience','role','ts'],
+}
+EXPORT_COMPACT_INTERVAL = float(os.environ.get('HR_EXPORT_COMPACT_INTERVAL', 300))
+EXPORT_FLUSH_INTERVAL = float(os.environ.get('HR_EXPORT_FLUSH_INTERVAL', 1.0))
+EXPORT_QUEUE_SIZE = int(os.environ.get('HR_EXPORT_QUEUE_SIZE', 10000))
 
 def init_excel():
-    try:
-        pd.read_excel(EXCEL_FILE)
-    except FileNotFoundError:
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            pd.DataFrame(columns=['emp_id','name','age','income','sat','overtime','involve','feedback','leaves_taken','ts']).to_excel(writer, sheet_name='Employees', index=False)
-            pd.DataFrame(columns=['name','designation','experience','role','ts']).to_excel(writer, sheet_name='Applicants', index=False)
+    if os.path.exists(EXCEL_FILE):
+        return
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, columns in EXPORT_SHEETS.items():
+        wb.create_sheet(sheet).append(columns)
+    wb.save(EXCEL_FILE)
+
+@contextlib.contextmanager
+def _file_lock(path, exclusive, blocking=True):
+    # Cross-process lock so gunicorn workers don't append while the journal is being rotated
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+            fcntl.flock(f, flags)
+        yield
+
+def journal_append(records):
+    # records are row dicts tagged with the target 'sheet'
+    data = ''.join(json.dumps(record, default=str) + '\n' for record in records).encode('utf-8')
+    with _file_lock(EXPORT_JOURNAL + '.lock', exclusive=False):
+        # One O_APPEND write per call, so concurrent writers never interleave or drop rows
+        fd = os.open(EXPORT_JOURNAL, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+_STOP = object()
+
+class ExportWorker:
+    def __init__(self, maxsize, flush_interval):
+        self.queue = queue.Queue(maxsize)
+        self.flush_interval = flush_interval
+        self.flushes = self.rows_written = self.overflows = self.errors = 0
+        self.last_flush_seconds = 0.0
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='export-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, sheet, row):
+        record = {'sheet': sheet, **row}
+        if self._thread is None:
+            # Not a serving process (CLI command): nothing would drain the queue
+            journal_append([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never drop a row: past the bound the caller pays for one O(1) journal append itself
+            self.overflows += 1
+            journal_append([record])
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        t0 = time.perf_counter()
+        try:
+            journal_append(batch)
+            self.rows_written += len(batch)
+        except Exception:
+            self.errors += 1
+            print("EXPORT FLUSH ERROR:", traceback.format_exc())
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - t0
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(('export.flush',), self.last_flush_seconds)
+
+    def stop(self, timeout=10):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {'queue_depth': self.queue.qsize(), 'flushes': self.flushes, 'rows_written': self.rows_written,
+                'overflows': self.overflows, 'errors': self.errors,
+                'last_flush_ms': round(self.last_flush_seconds * 1000, 3)}
+
+export_worker = ExportWorker(EXPORT_QUEUE_SIZE, EXPORT_FLUSH_INTERVAL)
 
 def append_employee_row(row):
-    try:
-        df = pd.read_excel(EXCEL_FILE, sheet_name='Employees')
-    except:
-        df = pd.DataFrame(columns=['emp_id','name','age','income','sat','overtime','involve','feedback','leaves_taken','ts'])
-    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        df.to_excel(writer, sheet_name='Employees', index=False)
+    with stage('export.append_employee'):
+        export_worker.submit('Employees', row)
 
 def append_applicant_row(row):
+    with stage('export.append_applicant'):
+        export_worker.submit('Applicants', row)
+
+def compact_export():
     try:
-        df = pd.read_excel(EXCEL_FILE, sheet_name='Applicants')
-    except:
-        df = pd.DataFrame(columns=['name','designation','experience','role','ts'])
-    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        df.to_excel(writer, sheet_name='Applicants', index=False)
+        with _file_lock(EXPORT_JOURNAL + '.compact.lock', exclusive=True, blocking=False), stage('export.compact'):
+            return _compact_journal()
+    except BlockingIOError:
+        return 0  # another worker is already compacting
+
+def _compact_journal():
+    pending = EXPORT_JOURNAL + '.compacting'
+    merged = pending + '.done'
+    tmp = EXCEL_FILE + '.tmp'
+    # Crash recovery. A .done batch is already in the saved tmp workbook, so only the swap is
+    # left (tmp is gone if the swap happened). A .compacting batch was never swapped in and is
+    # merged again below before the journal is rotated.
+    if os.path.exists(merged):
+        if os.path.exists(tmp):
+            os.replace(tmp, EXCEL_FILE)
+        os.remove(merged)
+    if not os.path.exists(pending):
+        with _file_lock(EXPORT_JOURNAL + '.lock', exclusive=True):
+            if not os.path.exists(EXPORT_JOURNAL):
+                return 0
+            os.replace(EXPORT_JOURNAL, pending)
+
+    old = openpyxl.load_workbook(EXCEL_FILE, read_only=True) if os.path.exists(EXCEL_FILE) else None
+    wb = openpyxl.Workbook(write_only=True)
+    count = 0
+    for sheet, columns in EXPORT_SHEETS.items():
+        ws = wb.create_sheet(sheet)
+        if old is not None and sheet in old.sheetnames:
+            for values in old[sheet].iter_rows(values_only=True):
+                ws.append(values)
+        else:
+            ws.append(columns)
+        with open(pending, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get('sheet') == sheet:
+                    ws.append([record.get(col) for col in columns])
+                    count += 1
+    wb.save(tmp)
+    if old is not None:
+        old.close()
+    os.replace(pending, merged)
+    os.replace(tmp, EXCEL_FILE)
+    os.remove(merged)
+    return count
+
+def _export_compactor():
+    while True:
+        time.sleep(EXPORT_COMPACT_INTERVAL)
+        try:
+            compact_export()
+        except Exception:
+            print("EXPORT COMPACTION ERROR:", traceback.format_exc())
 
 init_excel()
 
+@app.cli.command('compact-export')
+def compact_export_command():
+    t0 = time.perf_counter()
+    n = compact_export()
+    print(f"Compacted {n} journal rows into {EXCEL_FILE} in {time.perf_counter() - t0:.2f}s")
+
 # -------------------------- Job Roles --------------------------
 JOB_ROLES = [
     "Data Scientist", "Software Engineer", "HR Manager", "Product Manager",
@@ -97,37 +499,43 @@ DEFAULTS = {
 }
 
 # -------------------------- Self-Train Models --------------------------
-def train_models():
-    np.random.seed(42)
-    n_samples = 1000
+def synthetic_employees(n_samples, seed=42):
+    # RandomState(seed) draws the same sequence the original np.random.seed(42) did
+    rng = np.random.RandomState(seed)
     data = {
-        'Age': np.random.randint(18, 65, n_samples),
-        'MonthlyIncome': np.random.randint(3000, 20000, n_samples),
-        'JobSatisfaction': np.random.randint(1, 5, n_samples),
-        'JobInvolvement': np.random.randint(1, 5, n_samples),
-        'YearsAtCompany': np.random.randint(0, 40, n_samples),
-        'YearsInCurrentRole': np.random.randint(0, 18, n_samples),
-        'YearsWithCurrManager': np.random.randint(0, 17, n_samples),
-        'TotalWorkingYears': np.random.randint(0, 40, n_samples),
-        'DistanceFromHome': np.random.randint(1, 30, n_samples),
-        'WorkLifeBalance': np.random.randint(1, 5, n_samples),
-        'EnvironmentSatisfaction': np.random.randint(1, 5, n_samples),
-        'OverTime': np.random.choice(['Yes', 'No'], n_samples),
-        'FeedbackSentiment': np.random.uniform(-1, 1, n_samples)
+        'Age': rng.randint(18, 65, n_samples),
+        'MonthlyIncome': rng.randint(3000, 20000, n_samples),
+        'JobSatisfaction': rng.randint(1, 5, n_samples),
+        'JobInvolvement': rng.randint(1, 5, n_samples),
+        'YearsAtCompany': rng.randint(0, 40, n_samples),
+        'YearsInCurrentRole': rng.randint(0, 18, n_samples),
+        'YearsWithCurrManager': rng.randint(0, 17, n_samples),
+        'TotalWorkingYears': rng.randint(0, 40, n_samples),
+        'DistanceFromHome': rng.randint(1, 30, n_samples),
+        'WorkLifeBalance': rng.randint(1, 5, n_samples),
+        'EnvironmentSatisfaction': rng.randint(1, 5, n_samples),
+        'OverTime': rng.choice(['Yes', 'No'], n_samples),
+        'FeedbackSentiment': rng.uniform(-1, 1, n_samples)
     }
-    df = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+def train_models():
+    df = synthetic_employees(1000)
     df['OverTime_Yes'] = (df['OverTime'] == 'Yes').astype(int)
     df['OverTime_No'] = (df['OverTime'] == 'No').astype(int)
     df['Attrition'] = ((df['JobSatisfaction'] <= 2) & (df['MonthlyIncome'] < 6000)).astype(int)
     df['Promotion'] = ((df['JobSatisfaction'] >= 3) & (df['TotalWorkingYears'] > 5)).astype(int)
 
-    X = df[FEATURES_14]
-    y_attrition = df['Attrition']
-    y_promotion = df['Promotion']
+    return fit_models(df[FEATURES_14], df['Attrition'], df['Promotion'])
+
+def fit_models(X, y_attrition, y_promotion):
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
 
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
-    pca = PCA(n_components=10)
+    pca = PCA(n_components=min(10, len(X)))
     X_pca = pca.fit_transform(X_scaled)
 
     model_attrition = RandomForestClassifier(n_estimators=100, random_state=42)
@@ -137,40 +545,1263 @@ def train_models():
 
     return model_attrition, model_promotion, scaler, pca
 
-model_attrition, model_promotion, scaler, pca = train_models()
+# -------------------------- Fused Single-Row Inference --------------------------
+# StandardScaler + PCA collapse into one affine map z = x @ W + b, and both
+# forests are flattened into shared node arrays so one row walks all trees of
+# both models together, one depth level per step, without sklearn dispatch.
+class FusedPredictor:
+    def __init__(self, scaler, pca, forests):
+        mean = scaler.mean_ if scaler.mean_ is not None else 0.0
+        scale = scaler.scale_ if scaler.scale_ is not None else 1.0
+        C = pca.components_
+        if pca.whiten:
+            C = C / np.sqrt(pca.explained_variance_)[:, None]
+        self.W = (C / scale).T
+        self.b = -(mean / scale + pca.mean_) @ C.T
+
+        n_classes = max(len(f.classes_) for f in forests)
+        feature, threshold, left, right, value, positive, roots = [], [], [], [], [], [], []
+        self.forests = []
+        offset = 0
+        for forest in forests:
+            start = len(roots)
+            pos = np.flatnonzero(forest.classes_ == 1)
+            for est in forest.estimators_:
+                t = est.tree_
+                nodes = np.arange(t.node_count)
+                leaf = t.children_left == -1
+                # Leaves loop back onto themselves so every tree can take max_depth steps
+                feature.append(np.where(leaf, 0, t.feature))
+                threshold.append(np.where(leaf, np.inf, t.threshold))
+                left.append(np.where(leaf, nodes, t.children_left) + offset)
+                right.append(np.where(leaf, nodes, t.children_right) + offset)
+                v = t.value[:, 0, :]
+                if not np.allclose(v.sum(axis=1), 1.0):  # sklearn < 1.4 stores counts
+                    v = v / v.sum(axis=1, keepdims=True)
+                value.append(np.pad(v, ((0, 0), (0, n_classes - v.shape[1]))))
+                positive.append(v[:, pos[0]] if len(pos) else np.zeros(t.node_count))
+                roots.append(offset)
+                offset += t.node_count
+            self.forests.append((start, len(roots), forest.classes_))
+        # Narrow dtypes: a float32 z satisfies z <= t exactly when z <= (largest float32 <= t),
+        # so thresholds shrink to float32 without changing a single decision
+        threshold = np.concatenate(threshold)
+        threshold32 = threshold.astype(np.float32)
+        over = threshold32 > threshold
+        threshold32[over] = np.nextafter(threshold32[over], np.float32(-np.inf))
+        self.feature = np.concatenate(feature).astype(np.uint8 if self.W.shape[1] <= 256 else np.int32)
+        self.threshold = threshold32
+        self.left = np.concatenate(left).astype(np.int32)
+        self.right = np.concatenate(right).astype(np.int32)
+        self.value = np.concatenate(value)
+        self.positive = np.concatenate(positive)
+        self.roots = np.array(roots, dtype=np.int32)
+        self.max_depth = max(est.tree_.max_depth for f in forests for est in f.estimators_)
+
+    # Flat on-disk form: one .npy per array plus forest.json, loaded with mmap_mode='r'
+    # so every worker maps the same page-cache copy instead of unpickling sklearn trees
+    ARRAYS = ('W', 'b', 'feature', 'threshold', 'left', 'right', 'value', 'positive', 'roots')
+
+    def save(self, path):
+        tmp = tempfile.mkdtemp(prefix='.forest-', dir=os.path.dirname(path) or '.')
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp, name + '.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {'max_depth': int(self.max_depth),
+                'forests': [[int(a), int(b), [int(c) for c in classes]] for a, b, classes in self.forests]}
+        with open(os.path.join(tmp, 'forest.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:  # another worker exported it first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        self = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+        with open(os.path.join(path, 'forest.json')) as f:
+            meta = json.load(f)
+        self.max_depth = meta['max_depth']
+        self.forests = [(a, b, np.array(classes)) for a, b, classes in meta['forests']]
+        return self
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def transform(self, x):
+        # Trees compare float32 inputs against float32-floored thresholds, matching sklearn exactly
+        return (x @ self.W + self.b).astype(np.float32)
+
+    def predict_proba(self, x):
+        return self.predict_proba_transformed(self.transform(x))
+
+    def predict_proba_transformed(self, z):
+        node = self.roots
+        for _ in range(self.max_depth):
+            node = np.where(z[self.feature[node]] <= self.threshold[node], self.left[node], self.right[node])
+        leaves = self.value[node]
+        return [(leaves[a:b].sum(axis=0) / (b - a))[:len(classes)] for a, b, classes in self.forests]
+
+    def _leaf_mask(self):
+        leaf = getattr(self, '_leaf', None)
+        if leaf is None:
+            leaf = self._leaf = self.left == np.arange(len(self.left))
+        return leaf
+
+    def predict_proba_batch(self, X):
+        # Same walk for many rows at once over flat (row, tree) pairs, dropping pairs at their leaf
+        Z = self.transform(np.atleast_2d(X))
+        n, k = Z.shape
+        trees = len(self.roots)
+        node = np.tile(np.asarray(self.roots), n)
+        offset = np.repeat(np.arange(n) * k, trees)
+        z = Z.ravel()
+        leaf = self._leaf_mask()
+        active = np.flatnonzero(~leaf[node])
+        while active.size:
+            cur = node[active]
+            nxt = np.where(z[offset[active] + self.feature[cur]] <= self.threshold[cur], self.left[cur], self.right[cur])
+            node[active] = nxt
+            active = active[~leaf[nxt]]
+        leaves = self.value[node.reshape(n, trees)]
+        return [(leaves[:, a:b].sum(axis=1) / (b - a))[:, :len(classes)] for a, b, classes in self.forests]
+
+    def explain(self, X, ref):
+        # Path attribution in the same single walk as predict: at every split the change
+        # in positive-class value is credited to the split's PCA component. Each
+        # component's credit is then shared over FEATURES_14 in proportion to its linear
+        # terms W[i, j] * (x_i - ref_i), so inputs equal to the reference row get none.
+        # Per forest returns (base, contributions) with
+        # base + contributions.sum(axis=1) == positive-class probability.
+        X = np.atleast_2d(X)
+        Z = self.transform(X)
+        n, k = Z.shape
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, len(self.roots)))
+        credit = [np.zeros(n * k) for _ in self.forests]
+        for _ in range(self.max_depth):
+            f = self.feature[node]
+            nxt = np.where(Z[rows, f] <= self.threshold[node], self.left[node], self.right[node])
+            delta = self.positive[nxt] - self.positive[node]
+            flat = rows * k + f
+            for c, (a, b, _) in zip(credit, self.forests):
+                c += np.bincount(flat[:, a:b].ravel(), weights=delta[:, a:b].ravel(), minlength=n * k)
+            node = nxt
+
+        terms = self.W[None, :, :] * (X - ref)[:, :, None]
+        totals = terms.sum(axis=1, keepdims=True)
+        magnitude = np.abs(terms).sum(axis=1, keepdims=True)
+        mapped = magnitude > 1e-12
+        # Where the terms mostly cancel, t / total blows up; split by |t| instead so shares stay bounded
+        signed = np.abs(totals) >= 0.5 * magnitude
+        share = np.where(signed, np.divide(terms, totals, out=np.zeros_like(terms), where=signed & mapped),
+                         np.divide(np.abs(terms), magnitude, out=np.zeros_like(terms), where=mapped))
+        out = []
+        for c, (a, b, _) in zip(credit, self.forests):
+            c = c.reshape(n, k) / (b - a)
+            contributions = np.einsum('nik,nk->ni', share, c)
+            # Credit on a component with no feature-level terms stays in the base
+            base = self.positive[self.roots[a:b]].mean() + (c * ~mapped[:, 0, :]).sum(axis=1)
+            out.append((base, contributions))
+        return out
+
+# -------------------------- Model Registry --------------------------
+# Models are trained by `flask --app app build-models` (synthetic data) or by
+# background retraining (see Model Retraining), which joblib.dump them (same
+# convention as the notebooks' preprocessor.pkl / pca.pkl) into
+# models/<version>/, where <version> is a hash of the artifact contents.
+# Workers load the version named in models/CURRENT and follow it when it moves.
+MODEL_DIR = os.environ.get('HR_MODEL_DIR', 'models')
+MODEL_ARTIFACTS = ('model_attrition', 'model_promotion', 'scaler', 'pca')
+
+class ModelBundle:
+    # Inference runs on the memory-mapped FusedPredictor. The sklearn objects are only
+    # unpickled when something asks for them (reference path, retraining validation).
+    def __init__(self, version, fused, load_sklearn):
+        self.version = version
+        self.fused = fused
+        self._load_sklearn = load_sklearn
+        self._sklearn = None
+        self._lock = threading.Lock()
+
+    def sklearn_models(self):
+        if self._sklearn is None:
+            with self._lock:
+                if self._sklearn is None:
+                    self._sklearn = self._load_sklearn()
+        return self._sklearn
+
+    model_attrition = property(lambda self: self.sklearn_models()[0])
+    model_promotion = property(lambda self: self.sklearn_models()[1])
+    scaler = property(lambda self: self.sklearn_models()[2])
+    pca = property(lambda self: self.sklearn_models()[3])
+
+def _artifact_version(blobs):
+    h = hashlib.sha256()
+    for name in MODEL_ARTIFACTS:
+        h.update(name.encode('utf-8'))
+        h.update(blobs[name])
+    return h.hexdigest()[:12]
+
+def save_model_bundle(models, model_dir=MODEL_DIR):
+    blobs = {}
+    for name, obj in zip(MODEL_ARTIFACTS, models):
+        buf = io.BytesIO()
+        joblib.dump(obj, buf)
+        blobs[name] = buf.getvalue()
+    version = _artifact_version(blobs)
+
+    os.makedirs(model_dir, exist_ok=True)
+    target = os.path.join(model_dir, version)
+    if not os.path.isdir(target):
+        tmp = tempfile.mkdtemp(prefix='.build-', dir=model_dir)
+        for name, blob in blobs.items():
+            with open(os.path.join(tmp, name + '.pkl'), 'wb') as f:
+                f.write(blob)
+        manifest = {
+            'version': version,
+            'created': datetime.datetime.now().isoformat(),
+            'files': {name + '.pkl': hashlib.sha256(blob).hexdigest() for name, blob in blobs.items()},
+        }
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        FusedPredictor(models[2], models[3], list(models[:2])).save(os.path.join(tmp, 'forest'))
+        os.rename(tmp, target)
+
+    # Point CURRENT at the new version atomically so a booting worker never sees a half-written file
+    pointer = os.path.join(model_dir, 'CURRENT')
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(pointer + '.tmp', pointer)
+    return version
+
+def load_model_bundle(model_dir=MODEL_DIR, version=None):
+    if version is None:
+        with open(os.path.join(model_dir, 'CURRENT')) as f:
+            version = f.read().strip()
+    target = os.path.join(model_dir, version)
+
+    def load_sklearn():
+        blobs = {}
+        for name in MODEL_ARTIFACTS:
+            with open(os.path.join(target, name + '.pkl'), 'rb') as f:
+                blobs[name] = f.read()
+        if _artifact_version(blobs) != version:
+            raise ValueError(f"Model artifacts in {target} do not match their version hash")
+        return tuple(joblib.load(io.BytesIO(blobs[name])) for name in MODEL_ARTIFACTS)
+
+    forest_dir = os.path.join(target, 'forest')
+    if not os.path.isdir(forest_dir):
+        # Versions built before the flat format get it exported on first load
+        if not os.path.exists(os.path.join(target, MODEL_ARTIFACTS[0] + '.pkl')):
+            raise FileNotFoundError(target)
+        model_attrition, model_promotion, scaler, pca = load_sklearn()
+        FusedPredictor(scaler, pca, [model_attrition, model_promotion]).save(forest_dir)
+    return ModelBundle(version, FusedPredictor.load(forest_dir), load_sklearn)
+
+class ModelRegistry:
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.current = None
+        self.load_seconds = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, fn):
+        # fn(bundle) runs after every swap, e.g. to drop caches tied to the old models
+        self._listeners.append(fn)
+
+    def load(self, version=None):
+        t0 = time.perf_counter()
+        self.current = load_model_bundle(self.model_dir, version)
+        self.load_seconds = time.perf_counter() - t0
+        for fn in self._listeners:
+            fn(self.current)
+        return self.current
+
+    def refresh(self):
+        # Follow CURRENT when another process swapped it. Requests keep the bundle they
+        # already fetched, so the swap is one reference assignment and never drops them.
+        if self.current is None:
+            return False
+        try:
+            with open(os.path.join(self.model_dir, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return False
+        if version == self.current.version:
+            return False
+        with self._lock:
+            if version != self.current.version:
+                self.load(version)
+                print(f"Swapped to models {version} in {self.load_seconds * 1000:.0f} ms", file=sys.stderr)
+        return True
+
+    def get(self):
+        # Models (and sklearn with them) load on the first prediction unless preload() ran
+        if self.current is None:
+            with self._lock:
+                if self.current is None:
+                    try:
+                        self.load()
+                    except FileNotFoundError:
+                        raise RuntimeError(f"No model artifacts in '{self.model_dir}'. Run `flask --app app build-models` first.")
+                    print(f"Loaded models {self.current.version} in {self.load_seconds * 1000:.0f} ms", file=sys.stderr)
+        return self.current
+
+registry = ModelRegistry(MODEL_DIR)
+if not os.path.exists(os.path.join(MODEL_DIR, 'CURRENT')):
+    print(f"WARNING: no model artifacts in '{MODEL_DIR}'. Run `flask --app app build-models`; predictions are disabled until then.", file=sys.stderr)
+
+@app.cli.command('build-models')
+def build_models_command():
+    t0 = time.perf_counter()
+    version = save_model_bundle(train_models())
+    print(f"Built models {version} in {time.perf_counter() - t0:.1f}s -> {os.path.join(MODEL_DIR, version)}")
+
+def _rss_bytes():
+    # (resident, shared file-backed) bytes of this process; Linux only
+    try:
+        with open('/proc/self/statm') as f:
+            resident, shared = (int(v) for v in f.read().split()[1:3])
+    except (OSError, ValueError):
+        return 0, 0
+    page = os.sysconf('SC_PAGE_SIZE')
+    return resident * page, shared * page
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+@app.cli.command('bench-forest')
+@click.option('-n', default=1000, help='Rows for the batch comparison (single-row uses n/5)')
+def bench_forest_command(n):
+    # Run in a fresh process: memory deltas are measured in load order
+    with open(os.path.join(MODEL_DIR, 'CURRENT')) as f:
+        version = f.read().strip()
+    target = os.path.join(MODEL_DIR, version)
+    bundle = load_model_bundle(MODEL_DIR, version)
+    X = feature_frame(synthetic_employees(n, seed=1)).to_numpy()
+
+    rss0, shared0 = _rss_bytes()
+    bundle.fused.predict_proba_batch(X)
+    rss1, shared1 = _rss_bytes()
+    importlib.import_module('sklearn.ensemble')
+    rss2, _ = _rss_bytes()
+    models = bundle.sklearn_models()
+    rss3, _ = _rss_bytes()
+    model_attrition, model_promotion, scaler, pca = models
+
+    def sklearn_proba(rows):
+        X_pca = pca.transform(scaler.transform(pd.DataFrame(rows, columns=FEATURES_14)))
+        return [model.predict_proba(X_pca) for model in (model_attrition, model_promotion)]
+
+    timings = {}
+    single = X[:max(n // 5, 1)]
+    for name, fn in (('sklearn', lambda x: sklearn_proba(x[None, :])), ('flat', bundle.fused.predict_proba)):
+        t0 = time.perf_counter()
+        for x in single:
+            fn(x)
+        timings[name + '_row_us'] = (time.perf_counter() - t0) / len(single) * 1e6
+    for name, fn in (('sklearn', sklearn_proba), ('flat', bundle.fused.predict_proba_batch)):
+        t0 = time.perf_counter()
+        result = fn(X)
+        timings[name + '_batch_ms'] = (time.perf_counter() - t0) * 1000
+        if name == 'sklearn':
+            expected = result
+    actual = bundle.fused.predict_proba_batch(X)
+    mismatches = sum(int((np.round(e, 3) != np.round(a, 3)).any(axis=1).sum()) for e, a in zip(expected, actual))
+
+    pickles = sum(os.path.getsize(os.path.join(target, name + '.pkl')) for name in MODEL_ARTIFACTS)
+    mb = 1 / 2 ** 20
+    print(f"on disk:  pickles {pickles * mb:.1f} MB, flat arrays {_dir_bytes(os.path.join(target, 'forest')) * mb:.1f} MB")
+    print(f"flat arrays: {bundle.fused.nbytes() * mb:.1f} MB mapped, RSS +{(rss1 - rss0) * mb:.1f} MB "
+          f"(+{(shared1 - shared0) * mb:.1f} MB shared page cache)")
+    print(f"sklearn:  import +{(rss2 - rss1) * mb:.1f} MB, unpickled forests +{(rss3 - rss2) * mb:.1f} MB private per worker")
+    print(f"row:      sklearn {timings['sklearn_row_us']:.0f} us, flat {timings['flat_row_us']:.0f} us "
+          f"({timings['sklearn_row_us'] / timings['flat_row_us']:.1f}x)")
+    print(f"batch {n}: sklearn {timings['sklearn_batch_ms']:.1f} ms, flat {timings['flat_batch_ms']:.1f} ms "
+          f"({timings['sklearn_batch_ms'] / timings['flat_batch_ms']:.1f}x)")
+    print(f"mismatches: {mismatches}/{2 * n}")
 
 # -------------------------- Password Utils --------------------------
+# bcrypt runs on its own bounded pool so a login burst queues here instead of
+# pinning every request thread. When the pool and its queue are full,
+# callers get PasswordBusy after PASSWORD_WAIT_SECONDS.
+BCRYPT_ROUNDS = int(os.environ.get('HR_BCRYPT_ROUNDS', 12))
+PASSWORD_WORKERS = int(os.environ.get('HR_PASSWORD_WORKERS', os.cpu_count() or 2))
+PASSWORD_QUEUE_SIZE = int(os.environ.get('HR_PASSWORD_QUEUE', 64))
+PASSWORD_WAIT_SECONDS = float(os.environ.get('HR_PASSWORD_WAIT', 5))
+PASSWORD_SAMPLES = 2048
+
+class PasswordBusy(RuntimeError):
+    pass
+
+password_pool = concurrent.futures.ThreadPoolExecutor(PASSWORD_WORKERS, thread_name_prefix='bcrypt')
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE)
+_password_stats_lock = threading.Lock()
+PASSWORD_STATS = {'queue_ms': collections.deque(maxlen=PASSWORD_SAMPLES),
+                  'hash_ms': collections.deque(maxlen=PASSWORD_SAMPLES),
+                  'login_ms': collections.deque(maxlen=PASSWORD_SAMPLES),
+                  'rehashed': 0, 'rejected': 0}
+
+def _record_password_sample(name, ms):
+    with _password_stats_lock:
+        PASSWORD_STATS[name].append(ms)
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(('password.' + name[:-3],), ms / 1000)
+
+def _timed_password_job(fn, args, submitted):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        done = time.perf_counter()
+        _record_password_sample('queue_ms', (started - submitted) * 1000)
+        _record_password_sample('hash_ms', (done - started) * 1000)
+
+def _run_password_job(fn, *args):
+    if not _password_slots.acquire(timeout=PASSWORD_WAIT_SECONDS):
+        with _password_stats_lock:
+            PASSWORD_STATS['rejected'] += 1
+        raise PasswordBusy("Password workers are saturated")
+    try:
+        future = password_pool.submit(_timed_password_job, fn, args, time.perf_counter())
+        return future.result()
+    finally:
+        _password_slots.release()
+
+def _hashpw(pw):
+    return bcrypt.hashpw(pw.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+
+def _checkpw(pw, hashed):
+    return bcrypt.checkpw(pw.encode('utf-8'), hashed.encode('utf-8'))
+
 def hash_password(pw):
-    return bcrypt.hashpw(pw.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return _run_password_job(_hashpw, pw)
 
 def check_password(pw, hashed):
-    return bcrypt.checkpw(pw.encode('utf-8'), hashed.encode('utf-8'))
+    return _run_password_job(_checkpw, pw, hashed)
+
+def needs_rehash(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def _percentiles(samples):
+    if not samples:
+        return {'count': 0}
+    values = np.fromiter(samples, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2)}
+
+def password_stats():
+    with _password_stats_lock:
+        snapshot = {name: list(v) if isinstance(v, collections.deque) else v for name, v in PASSWORD_STATS.items()}
+    stats = {name: _percentiles(v) if isinstance(v, list) else v for name, v in snapshot.items()}
+    stats.update(workers=PASSWORD_WORKERS, queue_size=PASSWORD_QUEUE_SIZE, rounds=BCRYPT_ROUNDS)
+    return stats
+
+# -------------------------- Admin Access --------------------------
+# Organization-wide endpoints (bulk reports, ...) need the X-Admin-Token
+# header to match HR_ADMIN_TOKEN; they are disabled when it is unset.
+ADMIN_TOKEN = os.environ.get('HR_ADMIN_TOKEN')
+
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+# -------------------------- Prediction Cache --------------------------
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+PREDICTION_CACHE_SIZE = int(os.environ.get('HR_PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('HR_PREDICTION_CACHE_TTL', 3600))
+
+# Predictions are keyed on (model version, 14-feature vector); sentiment on the feedback text
+prediction_cache = TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+sentiment_cache = TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+registry.subscribe(lambda bundle: prediction_cache.clear())
+explanation_cache = TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+registry.subscribe(lambda bundle: explanation_cache.clear())
+
+def feedback_sentiment(text):
+    text = text or ''
+    polarity = sentiment_cache.get(text)
+    if polarity is None:
+        polarity = textblob.TextBlob(text).sentiment.polarity
+        sentiment_cache.set(text, polarity)
+    return polarity
 
 # -------------------------- Prediction --------------------------
+_row_buffers = threading.local()
+
+def _row_buffer():
+    x = getattr(_row_buffers, 'x', None)
+    if x is None:
+        x = _row_buffers.x = np.empty(len(FEATURES_14))
+    return x
+
+def _fill_row(x, full, sentiment):
+    for i, name in enumerate(FEATURES_14):
+        if name == 'FeedbackSentiment':
+            x[i] = sentiment
+        elif name == 'OverTime_Yes':
+            x[i] = full['OverTime'] == 'Yes'
+        elif name == 'OverTime_No':
+            x[i] = full['OverTime'] == 'No'
+        else:
+            x[i] = full[name]
+    return x
+
 def predict(features):
+    full = DEFAULTS.copy()
+    full.update(features)
+    m = registry.get()
+    sentiment = full.get('FeedbackSentiment')
+    if sentiment is None:
+        with stage('predict.sentiment'):
+            sentiment = feedback_sentiment(full.get('Feedback', ''))
+    x = _fill_row(_row_buffer(), full, sentiment)
+
+    key = (m.version, x.tobytes())
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Scaler + PCA are one fused affine map and both forests are walked together
+    with stage('predict.scale_pca'):
+        z = m.fused.transform(x)
+    with stage('predict.forests'):
+        attrition_proba, promotion_proba = m.fused.predict_proba_transformed(z)
+    results = []
+    for proba, (_, _, classes) in zip((attrition_proba, promotion_proba), m.fused.forests):
+        label = classes[np.argmax(proba)]
+        prob = proba[classes == 1]
+        results += [('Yes' if label == 1 else 'No'), round(float(prob[0]) if len(prob) else 0.0, 3)]
+    results = tuple(results)
+    prediction_cache.set(key, results)
+    return results
+
+# Original DataFrame + sklearn path, kept as the reference the fused path is checked against
+def predict_reference(features):
     full = DEFAULTS.copy()
     full.update(features)
     df = pd.DataFrame([full])
-    df['FeedbackSentiment'] = TextBlob(full.get('Feedback', '')).sentiment.polarity
+    df['FeedbackSentiment'] = textblob.TextBlob(full.get('Feedback', '')).sentiment.polarity
     df['OverTime_Yes'] = (df['OverTime'] == 'Yes').astype(int)
     df['OverTime_No'] = (df['OverTime'] == 'No').astype(int)
     X = df[FEATURES_14]
-    X_scaled = scaler.transform(X)
-    X_pca = pca.transform(X_scaled)
+    m = registry.get()
+    X_scaled = m.scaler.transform(X)
+    X_pca = m.pca.transform(X_scaled)
 
-    attrition_pred = model_attrition.predict(X_pca)[0]
-    attrition_prob = model_attrition.predict_proba(X_pca)[0][1]
-    promotion_pred = model_promotion.predict(X_pca)[0]
-    promotion_prob = model_promotion.predict_proba(X_pca)[0][1]
+    attrition_pred = m.model_attrition.predict(X_pca)[0]
+    attrition_prob = m.model_attrition.predict_proba(X_pca)[0][1]
+    promotion_pred = m.model_promotion.predict(X_pca)[0]
+    promotion_prob = m.model_promotion.predict_proba(X_pca)[0][1]
 
     return (
         ('Yes' if attrition_pred == 1 else 'No'), round(float(attrition_prob), 3),
         ('Yes' if promotion_pred == 1 else 'No'), round(float(promotion_prob), 3)
     )
 
+@app.cli.command('bench-predict')
+@click.option('-n', default=500, help='Number of random profiles to score')
+def bench_predict_command(n):
+    rng = np.random.default_rng(0)
+    profiles = [{
+        'Age': int(rng.integers(18, 65)), 'MonthlyIncome': int(rng.integers(3000, 20000)),
+        'JobSatisfaction': int(rng.integers(1, 5)), 'JobInvolvement': int(rng.integers(1, 5)),
+        'OverTime': str(rng.choice(['Yes', 'No'])),
+        'Feedback': str(rng.choice(['', 'I love my team', 'Too much overtime, feeling burnt out', 'It is okay']))
+    } for _ in range(n)]
+
+    timings = {}
+    outputs = {}
+    for name, fn in (('reference', predict_reference), ('fused', predict)):
+        fn(profiles[0])  # warm-up
+        t0 = time.perf_counter()
+        outputs[name] = [fn(p) for p in profiles]
+        timings[name] = (time.perf_counter() - t0) / n * 1e6
+    mismatches = sum(a != b for a, b in zip(outputs['reference'], outputs['fused']))
+    print(f"reference: {timings['reference']:.0f} us/row")
+    print(f"fused:     {timings['fused']:.0f} us/row ({timings['reference'] / timings['fused']:.1f}x faster)")
+    print(f"mismatches: {mismatches}/{n}")
+
+# -------------------------- Batch Prediction --------------------------
+# employee table column -> model input name (same mapping save_profile uses)
+EMPLOYEE_FEATURE_MAP = {
+    'age': 'Age', 'income': 'MonthlyIncome', 'sat': 'JobSatisfaction',
+    'overtime': 'OverTime', 'involve': 'JobInvolvement', 'feedback': 'Feedback',
+    'feedback_sentiment': 'FeedbackSentiment'
+}
+# Synchronous request path; score larger sets with `flask --app app risk-sweep` or import-employees
+MAX_BATCH_ROWS = int(os.environ.get('HR_MAX_BATCH_ROWS', 5000))
+# Batches walk the shared memory-mapped arrays in FLAT_BATCH_CHUNK-row slices, which keeps
+# per-batch memory bounded. sklearn's C tree walk is faster above ~100 rows but costs each
+# worker ~90 MB of sklearn plus unpickled forests; HR_SKLEARN_BATCH_MIN=<rows> opts batches
+# of at least that size into it (0 = never)
+SKLEARN_BATCH_MIN = int(os.environ.get('HR_SKLEARN_BATCH_MIN', 0))
+FLAT_BATCH_CHUNK = 2048
+
+def _positive_proba(classes, proba):
+    # Column of class 1; a forest fit on a single class has no such column
+    idx = np.flatnonzero(classes == 1)
+    return proba[:, idx[0]] if len(idx) else np.zeros(len(proba))
+
+def batch_proba(m, X):
+    if SKLEARN_BATCH_MIN and len(X) >= SKLEARN_BATCH_MIN:
+        model_attrition, model_promotion, scaler, pca = m.sklearn_models()
+        X_pca = pca.transform(scaler.transform(pd.DataFrame(X, columns=FEATURES_14)))
+        return [model.predict_proba(X_pca) for model in (model_attrition, model_promotion)]
+    parts = [m.fused.predict_proba_batch(X[i:i + FLAT_BATCH_CHUNK]) for i in range(0, max(len(X), 1), FLAT_BATCH_CHUNK)]
+    return [np.concatenate(forest) for forest in zip(*parts)]
+
+def feature_frame(df):
+    df = df.copy()
+    for col, default in DEFAULTS.items():
+        if col not in df:
+            df[col] = default
+        elif col == 'OverTime':
+            df[col] = df[col].fillna(default)
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(default)
+    # Stored sentiment wins; TextBlob only runs for rows without one, once per distinct text
+    feedback = df['Feedback'].fillna('').astype(str) if 'Feedback' in df else pd.Series('', index=df.index)
+    stored = pd.to_numeric(df['FeedbackSentiment'], errors='coerce') if 'FeedbackSentiment' in df else pd.Series(np.nan, index=df.index)
+    missing = stored.isna()
+    polarity = {text: textblob.TextBlob(text).sentiment.polarity for text in feedback[missing].unique()}
+    df['FeedbackSentiment'] = stored.where(~missing, feedback.map(polarity))
+    df['OverTime_Yes'] = (df['OverTime'] == 'Yes').astype(int)
+    df['OverTime_No'] = (df['OverTime'] == 'No').astype(int)
+    return df[FEATURES_14].astype(float)
+
+def predict_batch(rows):
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    m = registry.get()
+    if df.empty:
+        return pd.DataFrame(columns=['attrition', 'attrition_prob', 'promotion', 'promotion_prob'])
+    probs = batch_proba(m, feature_frame(df).to_numpy())
+
+    # Labels follow from the probabilities exactly as RandomForest.predict does
+    out = {}
+    for key, (_, _, classes), proba in zip(('attrition', 'promotion'), m.fused.forests, probs):
+        labels = classes[np.argmax(proba, axis=1)]
+        out[key] = np.where(labels == 1, 'Yes', 'No')
+        out[key + '_prob'] = np.round(_positive_proba(classes, proba), 3)
+    return pd.DataFrame(out, index=df.index)
+
+def score_employees():
+    df = pd.read_sql_query("SELECT id AS emp_id, age, income, sat, overtime, involve, feedback, feedback_sentiment FROM employee", get_db())
+    results = predict_batch(df.rename(columns=EMPLOYEE_FEATURE_MAP))
+    return pd.concat([df[['emp_id']], results], axis=1)
+
+@app.cli.command('risk-sweep')
+@click.option('--out', default='-', help="CSV destination, '-' for stdout")
+def risk_sweep_command(out):
+    t0 = time.perf_counter()
+    scored = score_employees()
+    scored.to_csv(sys.stdout if out == '-' else out, index=False)
+    print(f"Scored {len(scored)} employees in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+# -------------------------- Explanations --------------------------
+# Per-feature contributions to each positive-class probability, from
+# FusedPredictor.explain (one extra walk of both forests per row, however
+# many features there are). Cached like predictions; batches are walked
+# EXPLAIN_CHUNK rows at a time.
+EXPLAIN_CHUNK = 1000
+EXPLAIN_TOP = 3
+# Shares are measured from the row predict() builds when no inputs are given, so a
+# field the caller never supplied (filled from DEFAULTS) is never named as a driver
+EXPLAIN_REF = _fill_row(np.empty(len(FEATURES_14)), DEFAULTS, 0.0)
+
+def _explanations(m, X):
+    (a_base, a_contrib), (p_base, p_contrib) = m.fused.explain(X, EXPLAIN_REF)
+    return [{key: {'base': round(float(base[i]), 4),
+                   'contributions': {name: round(float(v), 4) for name, v in zip(FEATURES_14, contrib[i])}}
+             for key, base, contrib in (('attrition', a_base, a_contrib), ('promotion', p_base, p_contrib))}
+            for i in range(len(X))]
+
+def explain(features):
+    full = DEFAULTS.copy()
+    full.update(features)
+    m = registry.get()
+    sentiment = full.get('FeedbackSentiment')
+    if sentiment is None:
+        sentiment = feedback_sentiment(full.get('Feedback', ''))
+    x = _fill_row(np.empty(len(FEATURES_14)), full, sentiment)
+    key = (m.version, x.tobytes())
+    cached = explanation_cache.get(key)
+    if cached is None:
+        with stage('explain'):
+            cached = _explanations(m, x[None, :])[0]
+        explanation_cache.set(key, cached)
+    return cached
+
+def explain_batch(rows):
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    if df.empty:
+        return []
+    m = registry.get()
+    X = feature_frame(df).to_numpy()
+    out = []
+    for start in range(0, len(X), EXPLAIN_CHUNK):
+        out += _explanations(m, X[start:start + EXPLAIN_CHUNK])
+    return out
+
+def top_factors(explanation, k=EXPLAIN_TOP):
+    # {'attrition': [[feature, contribution], ...], ...}, largest magnitude first.
+    # The OverTime one-hot pair is shown as the single input it came from.
+    out = {}
+    for key, part in explanation.items():
+        merged = collections.defaultdict(float)
+        for name, value in part['contributions'].items():
+            merged['OverTime' if name.startswith('OverTime_') else name] += value
+        ranked = sorted(merged.items(), key=lambda kv: -abs(kv[1]))[:k]
+        out[key] = [[name, round(value, 4)] for name, value in ranked if value]
+    return out
+
+# -------------------------- What-If Simulation --------------------------
+# One employee's feature row is tiled over the cartesian product of the
+# override axes and scored in one batch_proba call. Sentiment
+# comes from the stored value or is computed once. An axis is a list of
+# values, or {"scale": [...]} / {"delta": [...]} relative to the base value.
+# OverTime takes "Yes"/"No" and sets both one-hot columns.
+WHATIF_MAX_POINTS = int(os.environ.get('HR_WHATIF_MAX_POINTS', 10000))
+WHATIF_INPUTS = [name for name in FEATURES_14 if not name.startswith('OverTime_')] + ['OverTime']
+
+def _axis_values(name, spec, base):
+    if name == 'OverTime':
+        values = spec if isinstance(spec, list) else [spec]
+        if not all(v in ('Yes', 'No') for v in values):
+            raise ValueError("OverTime values must be 'Yes' or 'No'")
+        return values
+    if isinstance(spec, dict) and 'scale' in spec:
+        return [round(base * float(v), 4) for v in spec['scale']]
+    if isinstance(spec, dict) and 'delta' in spec:
+        return [round(base + float(v), 4) for v in spec['delta']]
+    return [float(v) for v in (spec if isinstance(spec, list) else [spec])]
+
+def whatif(features, grid):
+    full = DEFAULTS.copy()
+    full.update(features)
+    if full.get('FeedbackSentiment') is None:
+        full['FeedbackSentiment'] = feedback_sentiment(full.get('Feedback', ''))
+    unknown = set(grid) - set(WHATIF_INPUTS)
+    if unknown:
+        raise ValueError(f"Unknown inputs: {', '.join(sorted(unknown))}")
+    axes = [(name, _axis_values(name, spec, full.get(name))) for name, spec in grid.items()]
+    points = int(np.prod([len(values) for _, values in axes])) if axes else 1
+    if points == 0 or points > WHATIF_MAX_POINTS:
+        raise ValueError(f"Grid must have between 1 and {WHATIF_MAX_POINTS} points, got {points}")
+
+    base = _fill_row(np.empty(len(FEATURES_14)), full, full['FeedbackSentiment'])
+    X = np.tile(base, (points, 1))
+    mesh = np.meshgrid(*[np.arange(len(values)) for _, values in axes], indexing='ij')
+    for (name, values), idx in zip(axes, mesh):
+        idx = idx.ravel()
+        if name == 'OverTime':
+            yes = np.array([v == 'Yes' for v in values], dtype=float)[idx]
+            X[:, FEATURES_14.index('OverTime_Yes')] = yes
+            X[:, FEATURES_14.index('OverTime_No')] = 1 - yes
+        else:
+            X[:, FEATURES_14.index(name)] = np.array(values, dtype=float)[idx]
+
+    m = registry.get()
+    with stage('whatif'):
+        probs = batch_proba(m, np.vstack([base, X]))
+    shape = [len(values) for _, values in axes]
+    out = {'axes': [{'input': name, 'values': values} for name, values in axes], 'points': points}
+    for key, (_, _, classes), proba in zip(('attrition', 'promotion'), m.fused.forests, probs):
+        positive = _positive_proba(classes, proba)
+        out['base_' + key + '_prob'] = round(float(positive[0]), 4)
+        out[key + '_prob'] = np.round(positive[1:], 4).reshape(shape).tolist()
+    return out
+
+# -------------------------- Sentiment Backfill --------------------------
+def process_pool(workers):
+    # Never fork this process: another thread (chart warm-up, report_pool, the exporter) may
+    # hold a lock such as matplotlib's Figure._render_lock, and a forked child would inherit it
+    # held forever. forkserver children come from a clean, single-threaded server instead.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+
+def _score_sentiment_chunk(texts):
+    return [textblob.TextBlob(t or '').sentiment.polarity for t in texts]
+
+def _iter_feedback_chunks(chunk_size, rescore_all):
+    where = "" if rescore_all else " AND feedback_sentiment IS NULL"
+    last_id = ''
+    while True:
+        rows = get_db().execute(f"SELECT id, feedback FROM employee WHERE id > ?{where} ORDER BY id LIMIT ?",
+                            (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+def backfill_sentiment(chunk_size=1000, workers=None, rescore_all=False):
+    workers = workers or os.cpu_count() or 1
+    db = get_db()
+    done = 0
+
+    def write(rows, future):
+        nonlocal done
+        db.executemany("UPDATE employee SET feedback_sentiment=? WHERE id=?",
+                       zip(future.result(), (r[0] for r in rows)))
+        db.commit()
+        done += len(rows)
+
+    with process_pool(workers) as pool:
+        pending = collections.deque()
+        for rows in _iter_feedback_chunks(chunk_size, rescore_all):
+            pending.append((rows, pool.submit(_score_sentiment_chunk, [r[1] for r in rows])))
+            if len(pending) >= workers * 2:
+                write(*pending.popleft())
+        while pending:
+            write(*pending.popleft())
+    return done
+
+@app.cli.command('backfill-sentiment')
+@click.option('--chunk-size', default=1000)
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count)')
+@click.option('--all', 'rescore_all', is_flag=True, help='Re-score every row, e.g. after changing the sentiment engine')
+def backfill_sentiment_command(chunk_size, workers, rescore_all):
+    t0 = time.perf_counter()
+    n = backfill_sentiment(chunk_size, workers, rescore_all)
+    print(f"Scored feedback for {n} employees in {time.perf_counter() - t0:.1f}s")
+
+# -------------------------- Risk Aggregates --------------------------
+# employee_risk holds each employee's latest prediction. risk_bucket keeps
+# the counts per band/histogram bin and is adjusted by +-1 in the same
+# transaction, so cohort views never rescan or re-predict. Top-K at-risk
+# reads walk idx_employee_risk_attrition. `flask rebuild-risk` reseeds
+# everything from a batch scoring pass.
+RISK_BANDS = ('Low', 'Medium', 'High')
+RISK_HIST_BINS = 10
+RISK_TOP_K = int(os.environ.get('HR_RISK_TOP_K', 50))
+
+def risk_band(prob):
+    return 2 if prob > 0.7 else 1 if prob > 0.4 else 0
+
+def _prob_bin(prob):
+    return min(max(int(prob * RISK_HIST_BINS), 0), RISK_HIST_BINS - 1)
+
+def _risk_buckets(attrition_prob, promotion_prob):
+    return [('attrition_band', risk_band(attrition_prob)),
+            ('attrition_hist', _prob_bin(attrition_prob)),
+            ('promotion_hist', _prob_bin(promotion_prob))]
+
+def record_risks(db, records, model_version):
+    # records: [(emp_id, attrition_prob, promotion_prob)]; the last one wins for a repeated emp_id.
+    # Take the write lock before reading the old rows so concurrent saves can't double-count.
+    records = list({r[0]: r for r in records}.values())
+    if not db.in_transaction:
+        db.execute("BEGIN IMMEDIATE")
+    old = db.execute("SELECT attrition_prob, promotion_prob FROM employee_risk WHERE emp_id IN (SELECT value FROM json_each(?))",
+                     (json.dumps([r[0] for r in records]),)).fetchall()
+    delta = collections.Counter()
+    for attrition_prob, promotion_prob in old:
+        delta.subtract(_risk_buckets(attrition_prob, promotion_prob))
+    for _, attrition_prob, promotion_prob in records:
+        delta.update(_risk_buckets(attrition_prob, promotion_prob))
+    db.executemany('''INSERT INTO risk_bucket (metric, bucket, count) VALUES (?, ?, ?)
+                      ON CONFLICT (metric, bucket) DO UPDATE SET count = count + excluded.count''',
+                   [(metric, bucket, n) for (metric, bucket), n in delta.items() if n])
+    now = datetime.datetime.now().isoformat()
+    db.executemany("INSERT OR REPLACE INTO employee_risk VALUES (?,?,?,?,?)",
+                   [(emp_id, a, p, model_version, now) for emp_id, a, p in records])
+
+def record_risk(db, emp_id, attrition_prob, promotion_prob, model_version):
+    record_risks(db, [(emp_id, attrition_prob, promotion_prob)], model_version)
+
+def risk_summary(db):
+    counts = {'attrition_band': [0] * len(RISK_BANDS),
+              'attrition_hist': [0] * RISK_HIST_BINS,
+              'promotion_hist': [0] * RISK_HIST_BINS}
+    for metric, bucket, count in db.execute("SELECT metric, bucket, count FROM risk_bucket"):
+        if metric in counts and 0 <= bucket < len(counts[metric]):
+            counts[metric][bucket] = count
+    return {'total': sum(counts['attrition_band']),
+            'attrition_bands': dict(zip(RISK_BANDS, counts['attrition_band'])),
+            'attrition_histogram': counts['attrition_hist'],
+            'promotion_histogram': counts['promotion_hist'],
+            'bin_width': 1 / RISK_HIST_BINS}
+
+def top_at_risk(db, k):
+    rows = db.execute('''SELECT r.emp_id, e.name, r.attrition_prob, r.promotion_prob, r.model_version, r.ts
+                         FROM employee_risk r LEFT JOIN employee e ON e.id = r.emp_id
+                         ORDER BY r.attrition_prob DESC LIMIT ?''', (k,)).fetchall()
+    return [{'emp_id': emp_id, 'name': name, 'attrition_prob': a, 'promotion_prob': p,
+             'band': RISK_BANDS[risk_band(a)], 'model_version': version, 'ts': ts}
+            for emp_id, name, a, p, version, ts in rows]
+
+def rebuild_risk_aggregates():
+    db = get_db()
+    scored = score_employees()
+    version = registry.get().version
+    now = datetime.datetime.now().isoformat()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("DELETE FROM employee_risk")
+        db.executemany("INSERT INTO employee_risk VALUES (?,?,?,?,?)",
+                       ((emp_id, float(a), float(p), version, now) for emp_id, a, p in
+                        zip(scored['emp_id'], scored['attrition_prob'], scored['promotion_prob'])))
+        db.execute("DELETE FROM risk_bucket")
+        bins = RISK_HIST_BINS
+        db.execute('''INSERT INTO risk_bucket
+                      SELECT 'attrition_band', CASE WHEN attrition_prob > 0.7 THEN 2
+                                                    WHEN attrition_prob > 0.4 THEN 1 ELSE 0 END, COUNT(*)
+                      FROM employee_risk GROUP BY 2''')
+        for metric, column in (('attrition_hist', 'attrition_prob'), ('promotion_hist', 'promotion_prob')):
+            db.execute(f'''INSERT INTO risk_bucket
+                           SELECT ?, MIN(MAX(CAST({column} * ? AS INTEGER), 0), ?), COUNT(*)
+                           FROM employee_risk GROUP BY 2''', (metric, bins, bins - 1))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(scored)
+
+@app.cli.command('rebuild-risk')
+def rebuild_risk_command():
+    t0 = time.perf_counter()
+    n = rebuild_risk_aggregates()
+    print(f"Rebuilt risk aggregates for {n} employees in {time.perf_counter() - t0:.2f}s")
+
+# -------------------------- Bulk Import --------------------------
+# Streams an IBM HR attrition export (WA_Fn-UseC_-HR-Employee-Attrition.csv
+# layout, CSV or XLSX) IMPORT_CHUNK rows at a time. Per chunk: one batched
+# score of the stored profile columns (the same inputs save_profile and
+# rebuild-risk use, so the aggregates agree), then one transaction
+# that upserts the employees, bumps their profile panels and updates the
+# risk aggregates, then one journal append for the Excel export. Existing
+# employees keep their name, password, feedback and leave count.
+# POST /api/import spools the upload to IMPORT_DIR and runs it on
+# import_pool; progress goes to the import_job table. Chunks commit as they
+# go, so a failed job reports how many rows landed before the error.
+IMPORT_CHUNK = int(os.environ.get('HR_IMPORT_CHUNK', 5000))
+IMPORT_DIR = os.environ.get('HR_IMPORT_DIR', os.path.join(tempfile.gettempdir(), 'hr-imports'))
+IBM_EMPLOYEE_COLUMNS = {
+    'EmployeeNumber': 'id', 'Age': 'age', 'MonthlyIncome': 'income', 'JobSatisfaction': 'sat',
+    'OverTime': 'overtime', 'JobInvolvement': 'involve'
+}
+
+def _iter_import_chunks(fileobj, filename, chunk_size):
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+            while True:
+                batch = list(itertools.islice(rows, chunk_size))
+                if not batch:
+                    return
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            wb.close()
+    else:
+        yield from pd.read_csv(fileobj, chunksize=chunk_size)
+
+def _employee_number(value):
+    return str(int(value)) if isinstance(value, (int, float, np.integer, np.floating)) else str(value).strip()
+
+def import_chunk(db, df, model_version):
+    missing = set(IBM_EMPLOYEE_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+    total = len(df)
+    df = df.dropna(subset=list(IBM_EMPLOYEE_COLUMNS)).reset_index(drop=True)
+    if df.empty:
+        return 0, total
+    ids = [_employee_number(v) for v in df['EmployeeNumber']]
+    stored = {row[0]: row[1:] for row in db.execute(
+        "SELECT id, name, feedback, leaves_taken, feedback_sentiment FROM employee WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(ids),))}
+    scored = predict_batch(df[['Age', 'MonthlyIncome', 'JobSatisfaction', 'OverTime', 'JobInvolvement']].assign(
+        Feedback=[stored[emp_id][1] if emp_id in stored else '' for emp_id in ids],
+        FeedbackSentiment=[stored[emp_id][3] if emp_id in stored else 0.0 for emp_id in ids]))
+
+    rows = [(emp_id, stored[emp_id][0] if emp_id in stored else f"Employee {emp_id}",
+             int(age), int(income), int(sat), str(overtime), int(involve))
+            for emp_id, age, income, sat, overtime, involve in zip(
+                ids, df['Age'], df['MonthlyIncome'], df['JobSatisfaction'], df['OverTime'], df['JobInvolvement'])]
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany('''INSERT INTO employee (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, feedback_sentiment)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, '', 0, 0.0)
+                          ON CONFLICT (id) DO UPDATE SET age=excluded.age, income=excluded.income, sat=excluded.sat,
+                                                        overtime=excluded.overtime, involve=excluded.involve''', rows)
+        bump_dashboard_versions(db, [(emp_id, 'profile') for emp_id in ids])
+        record_risks(db, list(zip(ids, scored['attrition_prob'].astype(float), scored['promotion_prob'].astype(float))),
+                     model_version)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    now = datetime.datetime.now().isoformat()
+    journal_append([{'sheet': 'Employees', 'emp_id': emp_id, 'name': name, 'age': age, 'income': income, 'sat': sat,
+                     'overtime': overtime, 'involve': involve,
+                     'feedback': stored[emp_id][1] if emp_id in stored else '',
+                     'leaves_taken': stored[emp_id][2] if emp_id in stored else 0, 'ts': now}
+                    for emp_id, name, age, income, sat, overtime, involve in rows])
+    return len(rows), total - len(rows)
+
+def import_employees(fileobj, filename, chunk_size=IMPORT_CHUNK, progress=None):
+    db = get_db()
+    version = registry.get().version
+    imported = skipped = chunks = 0
+    t0 = time.perf_counter()
+    for df in _iter_import_chunks(fileobj, filename, chunk_size):
+        n, bad = import_chunk(db, df, version)
+        imported += n
+        skipped += bad
+        chunks += 1
+        if progress is not None:
+            progress(imported, time.perf_counter() - t0)
+    seconds = time.perf_counter() - t0
+    return {'imported': imported, 'skipped': skipped, 'chunks': chunks, 'seconds': round(seconds, 2),
+            'rows_per_sec': round(imported / seconds, 1) if seconds else None, 'model_version': version}
+
+@app.cli.command('import-employees')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=IMPORT_CHUNK, help='Rows per batch / transaction')
+def import_employees_command(path, chunk_size):
+    def progress(n, elapsed):
+        print(f"{n} rows ({n / elapsed:.0f} rows/s)", file=sys.stderr)
+
+    with open(path, 'rb') as f:
+        summary = import_employees(f, path, chunk_size, progress)
+    print(json.dumps(summary, indent=2))
+
+import_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='import')
+
+def _update_import_job(job_id, **fields):
+    db = get_db()
+    db.execute(f"UPDATE import_job SET {', '.join(f'{k}=?' for k in fields)} WHERE id=?", (*fields.values(), job_id))
+    db.commit()
+
+def _run_import_job(job_id, path, filename, chunk_size):
+    _update_import_job(job_id, status='running')
+    try:
+        with open(path, 'rb') as f:
+            summary = import_employees(f, filename, chunk_size, lambda n, elapsed: _update_import_job(job_id, imported=n))
+    except Exception as e:
+        print("IMPORT JOB ERROR:", traceback.format_exc())
+        _update_import_job(job_id, status='failed', error=str(e), finished=time.time())
+    else:
+        _update_import_job(job_id, status='done', imported=summary['imported'], summary=json.dumps(summary),
+                           finished=time.time())
+    finally:
+        os.remove(path)
+
+def submit_import(upload, chunk_size):
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    filename = secure_filename(upload.filename)
+    path = os.path.join(IMPORT_DIR, f"{job_id}_{filename}")
+    upload.save(path)
+    db = get_db()
+    db.execute("INSERT INTO import_job (id, filename, status, created) VALUES (?, ?, 'queued', ?)",
+               (job_id, filename, time.time()))
+    db.commit()
+    import_pool.submit(_run_import_job, job_id, path, filename, chunk_size)
+    return job_id
+
+def get_import_job(job_id):
+    row = get_db().execute("SELECT id, filename, status, imported, summary, error, created, finished FROM import_job WHERE id=?",
+                           (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(('job_id', 'filename', 'status', 'imported', 'summary', 'error', 'created', 'finished'), row))
+    job['summary'] = json.loads(job['summary']) if job['summary'] else None
+    return job
+
+# -------------------------- Model Retraining --------------------------
+# Learns from employee rows that have a labeled outcome, using the same
+# feature_frame -> FEATURES_14 path as batch scoring. The candidate is fit on
+# a stable 80% split (by emp_id hash) and must score within
+# RETRAIN_TOLERANCE ROC AUC of the current models on the other 20% before
+# it is saved and CURRENT moves. Training runs on retrain_pool or the
+# periodic retrainer thread, never on a request thread. The other workers
+# pick up the new CURRENT through _model_watcher.
+RETRAIN_INTERVAL = float(os.environ.get('HR_RETRAIN_INTERVAL', 0))  # seconds, 0 = on demand only
+RETRAIN_MIN_ROWS = int(os.environ.get('HR_RETRAIN_MIN_ROWS', 200))
+RETRAIN_TOLERANCE = float(os.environ.get('HR_RETRAIN_TOLERANCE', 0.01))
+MODEL_POLL_INTERVAL = float(os.environ.get('HR_MODEL_POLL', 30))
+
+retrain_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='retrain')
+RETRAIN_STATUS = {'state': 'idle'}
+_retrain_status_lock = threading.Lock()
+
+def _label(value):
+    return 1 if str(value).strip().lower() in ('1', 'yes', 'true') else 0
+
+def record_outcomes(db, outcomes):
+    now = datetime.datetime.now().isoformat()
+    rows = [(str(o['emp_id']), _label(o['attrited']), _label(o['promoted']), now) for o in outcomes]
+    db.executemany("INSERT OR REPLACE INTO employee_outcome VALUES (?,?,?,?)", rows)
+    db.commit()
+    return len(rows)
+
+def training_data(db):
+    df = pd.read_sql_query('''SELECT e.id AS emp_id, e.age, e.income, e.sat, e.overtime, e.involve,
+                                     e.feedback, e.feedback_sentiment, o.attrited, o.promoted
+                              FROM employee e JOIN employee_outcome o ON o.emp_id = e.id
+                              ORDER BY e.id''', db)
+    X = feature_frame(df.rename(columns=EMPLOYEE_FEATURE_MAP))
+    return df['emp_id'], X, df['attrited'].astype(int), df['promoted'].astype(int)
+
+def _holdout_mask(emp_ids):
+    return np.array([int(hashlib.md5(str(e).encode('utf-8')).hexdigest(), 16) % 5 == 0 for e in emp_ids])
+
+def _holdout_scores(models, X, y_attrition, y_promotion):
+    from sklearn.metrics import roc_auc_score
+    model_attrition, model_promotion, scaler, pca = models
+    X_pca = pca.transform(scaler.transform(X))
+    scores = {}
+    for key, model, y in (('attrition', model_attrition, y_attrition), ('promotion', model_promotion, y_promotion)):
+        proba = _positive_proba(model.classes_, model.predict_proba(X_pca))
+        scores[key] = round(float(roc_auc_score(y, proba)), 4)
+    return scores
+
+def retrain_models():
+    emp_ids, X, y_attrition, y_promotion = training_data(get_db())
+    if len(X) < RETRAIN_MIN_ROWS:
+        return {'state': 'skipped', 'reason': f"{len(X)} labeled rows, need {RETRAIN_MIN_ROWS}"}
+    holdout = _holdout_mask(emp_ids)
+    for y in (y_attrition, y_promotion):
+        if y[~holdout].nunique() < 2 or y[holdout].nunique() < 2:
+            return {'state': 'skipped', 'reason': "Both outcome classes are needed in training and holdout rows"}
+
+    candidate = fit_models(X[~holdout], y_attrition[~holdout], y_promotion[~holdout])
+    held = (X[holdout], y_attrition[holdout], y_promotion[holdout])
+    new_scores = _holdout_scores(candidate, *held)
+    m = registry.get()
+    current_scores = _holdout_scores(m.sklearn_models(), *held)
+    result = {'rows': len(X), 'holdout_rows': int(holdout.sum()),
+              'candidate_auc': new_scores, 'current_auc': current_scores, 'previous_version': m.version}
+    if any(new_scores[k] < current_scores[k] - RETRAIN_TOLERANCE for k in new_scores):
+        return dict(result, state='rejected')
+
+    version = save_model_bundle(candidate)
+    registry.load(version)
+    rebuild_risk_aggregates()
+    return dict(result, state='swapped', version=version)
+
+def run_retrain_job():
+    with _retrain_status_lock:
+        if RETRAIN_STATUS['state'] == 'running':
+            return RETRAIN_STATUS
+        RETRAIN_STATUS.clear()
+        RETRAIN_STATUS.update(state='running', started=datetime.datetime.now().isoformat())
+    t0 = time.perf_counter()
+    try:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        # One retrain at a time across all worker processes
+        with _file_lock(os.path.join(MODEL_DIR, '.retrain.lock'), exclusive=True, blocking=False):
+            result = retrain_models()
+    except BlockingIOError:
+        result = {'state': 'skipped', 'reason': "Another process is retraining"}
+    except Exception as e:
+        print("RETRAIN ERROR:", traceback.format_exc(), file=sys.stderr)
+        result = {'state': 'failed', 'error': str(e)}
+    result['seconds'] = round(time.perf_counter() - t0, 2)
+    with _retrain_status_lock:
+        RETRAIN_STATUS.clear()
+        RETRAIN_STATUS.update(result, finished=datetime.datetime.now().isoformat())
+    print(f"Retrain {result['state']}: {result.get('reason') or result.get('version') or result.get('error', '')}", file=sys.stderr)
+    return result
+
+def submit_retrain():
+    with _retrain_status_lock:
+        if RETRAIN_STATUS['state'] in ('queued', 'running'):
+            return False
+        RETRAIN_STATUS['state'] = 'queued'
+    retrain_pool.submit(run_retrain_job)
+    return True
+
+def _retrainer():
+    while True:
+        time.sleep(RETRAIN_INTERVAL)
+        run_retrain_job()
+
+def _model_watcher():
+    while True:
+        time.sleep(MODEL_POLL_INTERVAL)
+        try:
+            registry.refresh()
+        except Exception:
+            print("MODEL REFRESH ERROR:", traceback.format_exc(), file=sys.stderr)
+
+@app.cli.command('retrain')
+def retrain_command():
+    result = run_retrain_job()
+    print(json.dumps(result, indent=2))
+
 # -------------------------- CHART GENERATORS --------------------------
-def create_gauge_chart(value, title):
-    fig, ax = plt.subplots(figsize=(3, 2), subplot_kw=dict(polar=True))
+# A gauge only shows a whole percentage and a risk colour, and the pie only a
+# done/pending split, so PNGs are rendered once per quantized value and
+# served from chart_cache. The startup warm-up also keeps every PNG in
+# CHART_CACHE_DIR, so only the first boot pays for rendering. Figures are
+# built with the OO API (no pyplot state), which lets the warm-up thread
+# render next to request threads.
+CHART_CACHE_SIZE = int(os.environ.get('HR_CHART_CACHE_SIZE', 512))
+CHART_CACHE_DIR = os.environ.get('HR_CHART_CACHE_DIR', 'chart_cache')
+CHART_WARMUP = os.environ.get('HR_CHART_WARMUP', '1') == '1'
+chart_cache = TTLCache(CHART_CACHE_SIZE, float('inf'))
+
+def _cached_chart(key, render):
+    png = chart_cache.get(key)
+    if png is None:
+        png = render()
+        chart_cache.set(key, png)
+    return io.BytesIO(png)
+
+def _risk_color(value):
+    return '#dc3545' if value > 0.7 else '#ffaa00' if value > 0.4 else '#28a745'
+
+def _render_gauge(percent, color, title):
+    fig = mpl_figure.Figure(figsize=(3, 2))
+    ax = fig.add_subplot(projection='polar')
     ax.set_theta_offset(np.pi / 2)
     ax.set_theta_direction(-1)
     ax.set_ylim(0, 1)
@@ -178,54 +1809,92 @@ def create_gauge_chart(value, title):
     ax.grid(False)
     ax.spines['polar'].set_visible(False)
 
-    color = '#dc3545' if value > 0.7 else '#ffaa00' if value > 0.4 else '#28a745'
-    angle = value * np.pi
+    angle = percent / 100 * np.pi
     ax.barh(1, angle, color=color, height=0.3)
-    ax.text(0, 0.3, f"{value:.0%}", ha='center', va='center', fontsize=12, fontweight='bold', color='white')
+    ax.text(0, 0.3, f"{percent}%", ha='center', va='center', fontsize=12, fontweight='bold', color='white')
     ax.set_title(title, pad=15, fontsize=9)
-    
+
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', dpi=100, transparent=True)
-    plt.close()
-    buf.seek(0)
-    return buf
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=100, transparent=True)
+    return buf.getvalue()
 
-def create_task_pie(tasks):
-    done = sum(1 for _, s in tasks if s == 'Done')
-    pending = len(tasks) - done
-    if done + pending == 0:
-        return None
+def _render_task_pie(done_percent):
     labels = ['Done', 'Pending']
-    sizes = [done, pending]
+    sizes = [done_percent, 100 - done_percent]
     colors = ['#28a745', '#dc3545']
 
-    fig, ax = plt.subplots(figsize=(3, 3))
+    fig = mpl_figure.Figure(figsize=(3, 3))
+    ax = fig.add_subplot()
     ax.pie(sizes, labels=labels, colors=colors, autopct='%1.0f%%', startangle=90)
     ax.axis('equal')
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', dpi=100)
-    plt.close()
-    buf.seek(0)
-    return buf
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=100)
+    return buf.getvalue()
+
+def _gauge_spec(value, title):
+    percent = int(f"{value:.0%}"[:-1])
+    color = _risk_color(value)
+    return ('gauge', title, percent, color), lambda: _render_gauge(percent, color, title)
+
+def _pie_spec(done, total):
+    done_percent = round(100 * done / total)
+    return ('pie', done_percent), lambda: _render_task_pie(done_percent)
+
+def create_gauge_chart(value, title):
+    return _cached_chart(*_gauge_spec(value, title))
+
+def create_task_pie(tasks):
+    done = sum(1 for _, s in tasks if s == 'Done')
+    pending = len(tasks) - done
+    if done + pending == 0:
+        return None
+    return _cached_chart(*_pie_spec(done, done + pending))
+
+def warm_chart_cache():
+    t0 = time.perf_counter()
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    specs = [_gauge_spec(p / 100, title) for p in range(101) for title in ('Risk', 'Chance')]
+    specs += [_pie_spec(p, 100) for p in range(101)]
+    for key, render in specs:
+        path = os.path.join(CHART_CACHE_DIR, '_'.join(str(k).lstrip('#') for k in key) + '.png')
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            png = render()
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(png)
+            os.replace(tmp, path)
+        chart_cache.set(key, png)
+    print(f"Chart cache warmed with {len(specs)} images in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
 
 # -------------------------- PDF Report (100% SAFE) --------------------------
 # -------------------------- PDF Report (FINAL FIX) --------------------------
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 16)
-        self.cell(0, 10, 'HR Insight Report', ln=True, align='C')
-        self.ln(5)
-
-    def add_image_stream(self, stream):
-        if stream:
-            stream.seek(0)
-            try:
-                self.image(stream, w=60, h=45)
-            except:
-                pass  # Skip image if broken
+_pdf_class = None
+
+def new_pdf():
+    # fpdf is imported lazily, so the PDF subclass is created on first use
+    global _pdf_class
+    if _pdf_class is None:
+        class PDF(fpdf.FPDF):
+            def header(self):
+                self.set_font('Arial', 'B', 16)
+                self.cell(0, 10, 'HR Insight Report', ln=True, align='C')
+                self.ln(5)
+
+            def add_image_stream(self, stream):
+                if stream:
+                    stream.seek(0)
+                    try:
+                        self.image(stream, w=60, h=45)
+                    except:
+                        pass  # Skip image if broken
+        _pdf_class = PDF
+    return _pdf_class()
 
 def generate_pdf(emp_id, profile_dict, results, tasks):
-    pdf = PDF()
+    pdf = new_pdf()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
@@ -246,6 +1915,8 @@ def generate_pdf(emp_id, profile_dict, results, tasks):
     pdf.cell(0, 7, f"Job Involvement: {profile_dict.get('involve', 'N/A')}/4", ln=True)
     feedback = (profile_dict.get('feedback') or '')[:100]
     pdf.cell(0, 7, f"Feedback: {feedback}{'...' if len(feedback) >= 100 else ''}", ln=True)
+    if profile_dict.get('feedback_sentiment') is not None:
+        pdf.cell(0, 7, f"Feedback Sentiment: {profile_dict['feedback_sentiment']:+.2f}", ln=True)
     pdf.ln(5)
 
     # Predictions
@@ -256,20 +1927,34 @@ def generate_pdf(emp_id, profile_dict, results, tasks):
 
     risk = "High" if attrition_prob > 0.7 else "Medium" if attrition_prob > 0.4 else "Low"
     pdf.cell(90, 8, f"Attrition: {results.get('attrition','N/A')} ({attrition_prob:.1%}) - {risk}", ln=0)
-    chart1 = create_gauge_chart(attrition_prob, "Risk")
+    with stage('pdf.chart_attrition'):
+        chart1 = create_gauge_chart(attrition_prob, "Risk")
     pdf.add_image_stream(chart1)
     pdf.ln(50)
 
     pdf.cell(90, 8, f"Promotion: {results.get('promotion','N/A')} ({promotion_prob:.1%})", ln=0)
-    chart2 = create_gauge_chart(promotion_prob, "Chance")
+    with stage('pdf.chart_promotion'):
+        chart2 = create_gauge_chart(promotion_prob, "Chance")
     pdf.add_image_stream(chart2)
     pdf.ln(55)
 
+    factors = results.get('factors') or {}
+    if any(factors.values()):
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 8, "Key Factors", ln=True)
+        pdf.set_font("Arial", "", 10)
+        for key in ('attrition', 'promotion'):
+            if factors.get(key):
+                text = ", ".join(f"{name} ({value:+.2f})" for name, value in factors[key])
+                pdf.cell(0, 6, f"{key.title()}: {text}", ln=True)
+        pdf.ln(3)
+
     # Tasks
     if tasks:
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 8, "Task Tracker", ln=True)
-        chart3 = create_task_pie(tasks)
+        with stage('pdf.chart_tasks'):
+            chart3 = create_task_pie(tasks)
         if chart3:
             pdf.add_image_stream(chart3)
         pdf.ln(75)
@@ -281,30 +1966,159 @@ def generate_pdf(emp_id, profile_dict, results, tasks):
     else:
         pdf.cell(0, 8, "No tasks recorded.", ln=True)
 
-    buffer = io.BytesIO()
     try:
-        # Use file-based output to avoid PNG crash
-        temp_path = f"temp_report_{emp_id}.pdf"
-        pdf.output(temp_path)
-        with open(temp_path, 'rb') as f:
-            buffer.write(f.read())
-        import os
-        os.remove(temp_path)  # Clean up
-        buffer.seek(0)
-        return buffer
+        with stage('pdf.serialize'):
+            return io.BytesIO(pdf_bytes(pdf))
     except Exception as e:
         print("PDF SAVE ERROR:", e)
         # Fallback: Text-only PDF
-        pdf = PDF()
+        pdf = new_pdf()
         pdf.add_page()
         pdf.set_font("Arial", "", 12)
         pdf.cell(0, 10, "PDF generation failed. Showing text only.", ln=True)
         pdf.cell(0, 10, f"Employee: {profile_dict.get('name')}", ln=True)
         pdf.cell(0, 10, f"Attrition: {results.get('attrition')} ({attrition_prob:.1%})", ln=True)
-        buffer = io.BytesIO()
-        pdf.output(buffer)
-        buffer.seek(0)
-        return buffer
+        return io.BytesIO(pdf_bytes(pdf))
+
+def pdf_bytes(pdf):
+    # Serialize in memory: fpdf 1.7 returns a latin-1 str for dest='S', fpdf2 returns a bytearray
+    out = pdf.output(dest='S')
+    return out.encode('latin-1') if isinstance(out, str) else bytes(out)
+
+# -------------------------- Report Jobs --------------------------
+# POST /api/reports snapshots the employee's data on the request thread and
+# renders the PDF on report_pool. Clients poll the job and download the
+# bytes once it is done. Jobs and their PDFs live in the report_job table,
+# so a poll can land on any worker, and are dropped REPORT_JOB_TTL seconds
+# after they finish. A job still unfinished after REPORT_JOB_TTL is assumed
+# lost with the worker that was rendering it.
+REPORT_WORKERS = int(os.environ.get('HR_REPORT_WORKERS', 2))
+REPORT_JOB_TTL = float(os.environ.get('HR_REPORT_JOB_TTL', 600))
+MAX_REPORT_JOBS = int(os.environ.get('HR_MAX_REPORT_JOBS', 1000))
+
+report_pool = concurrent.futures.ThreadPoolExecutor(REPORT_WORKERS, thread_name_prefix='report')
+
+def _set_report_job(job_id, status, pdf=None, finished=None):
+    db = get_db()
+    db.execute("UPDATE report_job SET status=?, pdf=?, finished=? WHERE id=?", (status, pdf, finished, job_id))
+    db.commit()
+
+def _run_report_job(job_id, emp_id, profile_dict, results, tasks):
+    _set_report_job(job_id, 'running')
+    try:
+        pdf = generate_pdf(emp_id, profile_dict, results, tasks).getvalue()
+    except Exception:
+        print("REPORT JOB ERROR:", traceback.format_exc())
+        _set_report_job(job_id, 'failed', finished=time.time())
+        return
+    _set_report_job(job_id, 'done', pdf, time.time())
+
+def submit_report_job(emp_id, profile_dict, results, tasks):
+    db = get_db()
+    job_id = uuid.uuid4().hex
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("DELETE FROM report_job WHERE COALESCE(finished, created) < ?", (time.time() - REPORT_JOB_TTL,))
+        if db.execute("SELECT COUNT(*) FROM report_job").fetchone()[0] >= MAX_REPORT_JOBS:
+            db.commit()
+            return None
+        db.execute("INSERT INTO report_job (id, emp_id, status, created) VALUES (?, ?, 'queued', ?)",
+                   (job_id, emp_id, time.time()))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    report_pool.submit(_run_report_job, job_id, emp_id, profile_dict, results, tasks)
+    return job_id
+
+def get_report_job(job_id, emp_id, with_pdf=False):
+    row = get_db().execute(f"SELECT emp_id, status{', pdf' if with_pdf else ''} FROM report_job WHERE id=? AND emp_id=?",
+                           (job_id, emp_id)).fetchone()
+    return dict(zip(('emp_id', 'status', 'pdf'), row)) if row is not None else None
+
+# -------------------------- Bulk Reports --------------------------
+# Every employee is scored in one predict_batch call. Profiles and tasks
+# are then read in keyset-paginated chunks, and PDFs are rendered on a
+# process pool. Each finished PDF is written straight into the ZIP, so
+# only a bounded number of reports are ever in memory.
+BULK_REPORT_CHUNK = 500
+
+def _render_report(args):
+    emp_id, profile_dict, results, tasks = args
+    return emp_id, generate_pdf(emp_id, profile_dict, results, tasks).getvalue()
+
+def _iter_report_inputs(chunk_size=BULK_REPORT_CHUNK):
+    db = get_db()
+    scored = score_employees().set_index('emp_id')
+    last_id = ''
+    while True:
+        rows = db.execute(f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employee WHERE id > ? ORDER BY id LIMIT ?",
+                          (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        ids = [r[0] for r in rows]
+        tasks = collections.defaultdict(list)
+        for emp_id, task, status in db.execute(
+                f"SELECT emp_id, task, status FROM task WHERE emp_id IN ({','.join('?' * len(ids))})", ids):
+            tasks[emp_id].append((task, status))
+        # One batched explanation pass per chunk
+        chunk = pd.DataFrame(rows, columns=EMPLOYEE_COLUMNS).rename(columns=EMPLOYEE_FEATURE_MAP)
+        factors = [top_factors(e) for e in explain_batch(chunk)]
+        for row, row_factors in zip(rows, factors):
+            profile_dict = dict(zip(EMPLOYEE_COLUMNS, row))
+            profile_dict.pop('password_hash')
+            results = dict(scored.loc[row[0]].to_dict(), factors=row_factors) if row[0] in scored.index else {}
+            yield row[0], profile_dict, results, tasks[row[0]]
+        last_id = ids[-1]
+
+def write_bulk_reports(fileobj, workers=None):
+    # Generator: yields the running count after each PDF lands in the archive
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf, \
+            process_pool(workers) as pool:
+        pending = collections.deque()
+        inputs = _iter_report_inputs()
+        while True:
+            for args in inputs:
+                pending.append(pool.submit(_render_report, args))
+                if len(pending) >= workers * 4:
+                    break
+            if not pending:
+                break
+            emp_id, pdf = pending.popleft().result()
+            zf.writestr(f"HR_Report_{secure_filename(emp_id) or 'employee'}.pdf", pdf)
+            count += 1
+            yield count
+
+class _ChunkBuffer(io.RawIOBase):
+    # Unseekable sink that lets ZipFile output be streamed out chunk by chunk
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+@app.cli.command('bulk-reports')
+@click.option('--out', default='hr_reports.zip')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count)')
+def bulk_reports_command(out, workers):
+    t0 = time.perf_counter()
+    count = 0
+    with open(out, 'wb') as f:
+        for count in write_bulk_reports(f, workers):
+            pass
+    elapsed = time.perf_counter() - t0
+    print(f"Wrote {count} reports to {out} in {elapsed:.1f}s ({count / elapsed:.1f} reports/s)")
 
 # -------------------------- Chatbot --------------------------
 def get_employee_bot_response(name, leaves_taken, user_msg):
@@ -323,7 +2137,85 @@ def get_employee_bot_response(name, leaves_taken, user_msg):
         return "Click 'Download Full PDF Report' after predictions."
     return "Ask about leaves, salary, tasks, or reports."
 
+def get_applicant_bot_response(user_msg):
+    msg = user_msg.lower()
+    return "Available Roles:\n• " + "\n• ".join(JOB_ROLES) if "job" in msg else \
+           "Openings: 3+ roles." if "vacanc" in msg else \
+           "Guidelines:\n• 30 days leave\n• Hybrid work" if "guide" in msg else \
+           "Choose: Job roles, Vacancies, Guidelines."
+
+def save_chat_turn(db, emp_id, user_msg, reply):
+    # Both messages and the chat panel version land in one transaction
+    now = datetime.datetime.now().isoformat()
+    turn = [(emp_id, 'user', user_msg, now), (emp_id, 'bot', reply, now)]
+    db.executemany("INSERT INTO chat VALUES (?,?,?,?)", turn)
+    bump_dashboard_version(db, emp_id, 'chat')
+    db.commit()
+    return [{'role': role, 'message': message, 'ts': ts} for _, role, message, ts in turn]
+
+def employee_chat_turn(db, emp_id, user_msg):
+    row = db.execute("SELECT name, leaves_taken FROM employee WHERE id=?", (emp_id,)).fetchone()
+    name = row[0] if row else "Employee"
+    leaves = row[1] if row else 0
+    return save_chat_turn(db, emp_id, user_msg, get_employee_bot_response(name, leaves, user_msg))
+
+def applicant_chat_turn(db, emp_id, user_msg):
+    return save_chat_turn(db, emp_id, user_msg, get_applicant_bot_response(user_msg))
+
+# -------------------------- Chat History --------------------------
+# Pages are read newest-first through idx_chat_emp_id_ts. The cursor "<ts>|<rowid>"
+# names the oldest message already shown, so ties on ts are handled exactly.
+CHAT_PAGE_SIZE = 50
+ChatMessage = collections.namedtuple('ChatMessage', ['rowid', 'role', 'message', 'ts'])
+
+def load_chat_page(db, emp_id, before=None, limit=CHAT_PAGE_SIZE):
+    if before:
+        ts, rowid = before.rsplit('|', 1)
+        rows = db.execute('''SELECT rowid, role, message, ts FROM chat
+                             WHERE emp_id=? AND (ts < ? OR (ts = ? AND rowid < ?))
+                             ORDER BY ts DESC, rowid DESC LIMIT ?''',
+                          (emp_id, ts, ts, int(rowid), limit + 1)).fetchall()
+    else:
+        rows = db.execute('''SELECT rowid, role, message, ts FROM chat WHERE emp_id=?
+                             ORDER BY ts DESC, rowid DESC LIMIT ?''', (emp_id, limit + 1)).fetchall()
+    messages = [ChatMessage(*r) for r in reversed(rows[:limit])]
+    cursor = f"{messages[0].ts}|{messages[0].rowid}" if len(rows) > limit else None
+    return messages, cursor
+
 # -------------------------- HTML TEMPLATES --------------------------
+CHAT_PAGER_SCRIPT = """
+<script>
+function chatBubble(m) {
+  const div = document.createElement('div');
+  div.className = 'chat-bubble ' + (m.role === 'user' ? 'user align-self-end' : 'bot align-self-start');
+  div.textContent = m.message;
+  return div;
+}
+function loadOlderChat(btn) {
+  fetch('/api/chat_history?before=' + encodeURIComponent(btn.dataset.cursor))
+    .then(r => r.json())
+    .then(data => {
+      const box = document.getElementById('chatBox');
+      const anchor = btn.nextElementSibling;
+      data.messages.forEach(m => box.insertBefore(chatBubble(m), anchor));
+      if (data.next_cursor) { btn.dataset.cursor = data.next_cursor; } else { btn.remove(); }
+    });
+}
+// Posts one message and appends the returned pair; false means fall back to the form post
+function sendChat(url, message) {
+  if (!window.fetch || !message) { return false; }
+  fetch(url, {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({message: message})})
+    .then(r => r.json())
+    .then(data => {
+      const box = document.getElementById('chatBox');
+      (data.messages || []).forEach(m => box.appendChild(chatBubble(m)));
+      box.scrollTop = box.scrollHeight;
+    });
+  return true;
+}
+</script>
+"""
+
 HTML_WELCOME = """
 <!DOCTYPE html>
 <html><head><meta charset="UTF-8"/><title>HR Insight Bot</title>
@@ -454,9 +2346,15 @@ HTML_EMPLOYEE = """
         <div class="result {{ 'high' if results.attrition_prob>0.7 else 'medium' if results.attrition_prob>0.4 else 'low' }}">
           Attrition: <strong>{{ results.attrition }}</strong> ({{ "%.1f"|format(results.attrition_prob*100) }}%)
         </div>
+        {% if results.factors and results.factors.attrition %}
+        <div class="small text-muted mb-2">Drivers: {% for name, value in results.factors.attrition %}{{ name }} ({{ "%+.2f"|format(value) }}){{ ", " if not loop.last }}{% endfor %}</div>
+        {% endif %}
         <div class="result {{ 'high' if results.promotion=='Yes' else 'low' }}">
           Promotion: <strong>{{ results.promotion }}</strong> ({{ "%.1f"|format(results.promotion_prob*100) }}%)
         </div>
+        {% if results.factors and results.factors.promotion %}
+        <div class="small text-muted mb-2">Drivers: {% for name, value in results.factors.promotion %}{{ name }} ({{ "%+.2f"|format(value) }}){{ ", " if not loop.last }}{% endfor %}</div>
+        {% endif %}
         <form method="post" action="/download_pdf" class="mt-3">
           <input type="hidden" name="emp_id" value="{{ session.emp_id }}"/>
           <button class="btn btn-success w-100">Download Full PDF Report</button>
@@ -497,15 +2395,19 @@ HTML_EMPLOYEE = """
     <div class="card p-3">
       <h4>Chat with HR Bot</h4>
       <div style="height:200px;overflow-y:auto;display:flex;flex-direction:column;" id="chatBox">
+        {% if chat_cursor %}
+          <button type="button" class="btn btn-link btn-sm text-light" data-cursor="{{ chat_cursor }}" onclick="loadOlderChat(this)">Load older messages</button>
+        {% endif %}
         {% for msg in chat_history %}
           <div class="chat-bubble {{ 'user' if msg.role=='user' else 'bot' }} align-self-{{ 'end' if msg.role=='user' else 'start' }}">
             {{ msg.message }}
           </div>
         {% endfor %}
       </div>
-      <form method="post" action="/chat" class="mt-2 d-flex">
+      <form method="post" action="/chat" class="mt-2 d-flex"
+            onsubmit="if (sendChat('/api/chat', this.message.value)) { event.preventDefault(); this.message.value = ''; }">
         <input type="hidden" name="emp_id" value="{{ session.emp_id }}"/>
-        <input name="message" class="form-control form-control-sm me-1" placeholder="Ask anything..."/>
+        <input name="message" class="form-control form-control-sm me-1" placeholder="Ask anything..." autocomplete="off"/>
         <button class="btn btn-primary btn-sm">Send</button>
       </form>
     </div>
@@ -514,8 +2416,8 @@ HTML_EMPLOYEE = """
 
 <script>
   {% if tasks %}
-    const done = {{ tasks | selectattr("status","equalto","Done") | list | length }};
-    const pending = {{ tasks | selectattr("status","equalto","Pending") | list | length }};
+    const done = {{ task_done }};
+    const pending = {{ task_pending }};
     if (done + pending > 0) {
       Plotly.newPlot('taskChart', [{
         values: [done, pending],
@@ -526,6 +2428,7 @@ HTML_EMPLOYEE = """
     }
   {% endif %}
 </script>
+""" + CHAT_PAGER_SCRIPT + """
 </body></html>
 """
 
@@ -568,6 +2471,9 @@ body{background:linear-gradient(135deg,#667eea,#764ba2);color:white;}
     <div class="card p-4">
       <h4>Chat with HR Bot</h4>
       <div style="height:400px;overflow-y:auto;display:flex;flex-direction:column;" id="chatBox">
+        {% if chat_cursor %}
+          <button type="button" class="btn btn-link btn-sm text-light" data-cursor="{{ chat_cursor }}" onclick="loadOlderChat(this)">Load older messages</button>
+        {% endif %}
         {% if not chat_history %}
           <div class="chat-bubble bot">Hello! Welcome to HR Service Chatbot.</div>
         {% endif %}
@@ -591,25 +2497,65 @@ body{background:linear-gradient(135deg,#667eea,#764ba2);color:white;}
 </div>
 <script>
 function send(opt) {
+  if (sendChat('/api/applicant_chat', opt)) { return; }
   document.getElementById('msgInput').value = opt;
   document.getElementById('chatForm').submit();
 }
 </script>
+""" + CHAT_PAGER_SCRIPT + """
 </body></html>
 """
 
+# -------------------------- Template Cache --------------------------
+# Templates are served through a DictLoader, so Jinja compiles each one once
+# (at startup) and keeps it in the environment's template cache instead of
+# re-parsing the source on every render_template_string call.
+TEMPLATES = {
+    'welcome.html': HTML_WELCOME,
+    'login.html': HTML_LOGIN,
+    'forgot_password.html': HTML_FORGOT_PASSWORD,
+    'set_password.html': HTML_SET_PASSWORD,
+    'employee.html': HTML_EMPLOYEE,
+    'applicant.html': HTML_APPLICANT,
+}
+app.jinja_loader = DictLoader(TEMPLATES)
+for _name in TEMPLATES:
+    app.jinja_env.get_template(_name)
+
+TEMPLATE_RENDER_STATS = collections.defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+_render_started = threading.local()
+_render_stats_lock = threading.Lock()
+
+def _before_render(sender, template, context, **extra):
+    _render_started.t0 = time.perf_counter()
+
+def _after_render(sender, template, context, **extra):
+    ms = (time.perf_counter() - _render_started.t0) * 1000
+    with _render_stats_lock:
+        stats = TEMPLATE_RENDER_STATS[template.name]
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(('render.' + template.name,), ms / 1000)
+
+before_render_template.connect(_before_render, app)
+template_rendered.connect(_after_render, app)
+
+TaskRow = collections.namedtuple('TaskRow', ['task', 'status'])
+
 # -------------------------- Routes --------------------------
 @app.route('/')
 def welcome():
-    return render_template_string(HTML_WELCOME)
+    return render_template('welcome.html')
 
 @app.route('/employee_login_page')
 def employee_login_page():
-    return render_template_string(HTML_LOGIN)
+    return render_template('login.html')
 
 @app.route('/forgot_password')
 def forgot_password():
-    return render_template_string(HTML_FORGOT_PASSWORD)
+    return render_template('forgot_password.html')
 
 @app.route('/recover_password', methods=['POST'])
 def recover_password():
@@ -618,10 +2564,19 @@ def recover_password():
         flash("Please enter your Employee ID.")
         return redirect(url_for('forgot_password'))
     session['pending_emp_id'] = emp_id
-    return render_template_string(HTML_SET_PASSWORD, emp_id=emp_id)
+    return render_template('set_password.html', emp_id=emp_id)
 
 @app.route('/employee_login', methods=['POST'])
 def employee_login():
+    started = time.perf_counter()
+    try:
+        return _employee_login()
+    finally:
+        _record_password_sample('login_ms', (time.perf_counter() - started) * 1000)
+
+def _employee_login():
+    db = get_db()
+    c = db.cursor()
     try:
         emp_id = request.form.get('emp_id', '').strip()
         password = request.form.get('password', '').strip()
@@ -634,73 +2589,94 @@ def employee_login():
 
         if row is None or row[0] is None:
             session['pending_emp_id'] = emp_id
-            return render_template_string(HTML_SET_PASSWORD, emp_id=emp_id)
+            return render_template('set_password.html', emp_id=emp_id)
 
         if check_password(password, row[0]):
+            if needs_rehash(row[0]):
+                c.execute("UPDATE employee SET password_hash=? WHERE id=?", (hash_password(password), emp_id))
+                db.commit()
+                with _password_stats_lock:
+                    PASSWORD_STATS['rehashed'] += 1
             session.clear()
             session['emp_id'] = emp_id
             return redirect(url_for('employee_dashboard'))
         else:
             flash("Invalid password.")
             return redirect(url_for('employee_login_page'))
+    except PasswordBusy:
+        flash("Too many logins right now, please try again.")
+        return redirect(url_for('employee_login_page'))
     except Exception:
         flash("Login failed.")
         return redirect(url_for('employee_login_page'))
 
 @app.route('/set_password', methods=['POST'])
 def set_password():
+    db = get_db()
+    c = db.cursor()
     try:
         emp_id = request.form['emp_id']
         pw1 = request.form['password']
         pw2 = request.form['confirm']
         if pw1 != pw2:
             flash("Passwords do not match.")
-            return render_template_string(HTML_SET_PASSWORD, emp_id=emp_id)
+            return render_template('set_password.html', emp_id=emp_id)
         if len(pw1) < 4:
             flash("Password must be at least 4 characters.")
-            return render_template_string(HTML_SET_PASSWORD, emp_id=emp_id)
+            return render_template('set_password.html', emp_id=emp_id)
 
         hashed = hash_password(pw1)
-        c.execute('''INSERT OR REPLACE INTO employee 
-                     (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, password_hash)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (emp_id, f"Employee {emp_id}", 30, 50000, 3, "No", 3, "", 0, hashed))
-        conn.commit()
+        # New ids get a default profile; an existing one (e.g. bulk imported) only gets the new
+        # password, keeping its profile and risk row in step
+        c.execute('''INSERT INTO employee
+                     (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, password_hash, feedback_sentiment)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     ON CONFLICT (id) DO UPDATE SET password_hash=excluded.password_hash''',
+                  (emp_id, f"Employee {emp_id}", 30, 50000, 3, "No", 3, "", 0, hashed, 0.0))
+        bump_dashboard_version(db, emp_id, 'profile')
+        db.commit()
         session.clear()
         session['emp_id'] = emp_id
         flash("Password set successfully! Welcome!")
         return redirect(url_for('employee_dashboard'))
+    except PasswordBusy:
+        flash("Server is busy, please try again.")
+        return render_template('set_password.html', emp_id=request.form.get('emp_id', ''))
     except Exception:
         flash("Error saving password.")
         return redirect(url_for('employee_login_page'))
 
 @app.route('/employee/dashboard')
 def employee_dashboard():
+    db = get_db()
+    c = db.cursor()
     if 'emp_id' not in session:
         return redirect(url_for('employee_login_page'))
 
     emp_id = session['emp_id']
-    c.execute("SELECT * FROM employee WHERE id=?", (emp_id,))
+    c.execute(EMPLOYEE_SELECT, (emp_id,))
     profile = c.fetchone()
     if not profile:
-        c.execute('''INSERT INTO employee (id, name, age, income, sat, overtime, involve, feedback, leaves_taken)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (emp_id, f"Employee {emp_id}", 30, 50000, 3, "No", 3, "", 0))
-        conn.commit()
-        c.execute("SELECT * FROM employee WHERE id=?", (emp_id,))
+        c.execute('''INSERT INTO employee (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, feedback_sentiment)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  (emp_id, f"Employee {emp_id}", 30, 50000, 3, "No", 3, "", 0, 0.0))
+        bump_dashboard_version(db, emp_id, 'profile')
+        db.commit()
+        c.execute(EMPLOYEE_SELECT, (emp_id,))
         profile = c.fetchone()
 
-    profile_dict = dict(zip(['id','name','age','income','sat','overtime','involve','feedback','leaves_taken','password_hash'], profile))
+    profile_dict = dict(zip(EMPLOYEE_COLUMNS, profile))
 
     c.execute("SELECT task, status FROM task WHERE emp_id=?", (emp_id,))
-    tasks = c.fetchall()
-    tasks = [type('obj', (object,), {'task': r[0], 'status': r[1]}) for r in tasks]
+    tasks = [TaskRow(*r) for r in c.fetchall()]
+    task_done = sum(1 for t in tasks if t.status == 'Done')
 
-    c.execute("SELECT role, message FROM chat WHERE emp_id=? ORDER BY ts", (emp_id,))
-    chat_history = [type('obj', (object,), {'role': r[0], 'message': r[1]}) for r in c.fetchall()]
+    chat_history, chat_cursor = load_chat_page(db, emp_id)
 
     results = session.get('results', {})
-    return render_template_string(HTML_EMPLOYEE, profile=profile_dict, tasks=tasks, results=results, chat_history=chat_history, job_roles=JOB_ROLES)
+    return render_template('employee.html', profile=profile_dict, tasks=tasks, results=results,
+                           task_done=task_done, task_pending=len(tasks) - task_done,
+                           chat_history=chat_history, chat_cursor=chat_cursor, job_roles=JOB_ROLES)
 
 @app.route('/applicant')
 def applicant():
@@ -710,25 +2686,54 @@ def applicant():
 @app.route('/applicant/portal')
 def applicant_portal():
     emp_id = session['emp_id']
-    c.execute("SELECT role, message FROM chat WHERE emp_id=? ORDER BY ts", (emp_id,))
-    chat_history = [type('obj', (object,), {'role': r[0], 'message': r[1]}) for r in c.fetchall()]
-    return render_template_string(HTML_APPLICANT, chat_history=chat_history, job_roles=JOB_ROLES)
+    chat_history, chat_cursor = load_chat_page(get_db(), emp_id)
+    return render_template('applicant.html', chat_history=chat_history, chat_cursor=chat_cursor, job_roles=JOB_ROLES)
+
+@app.route('/api/chat_history')
+def api_chat_history():
+    if 'emp_id' not in session:
+        return jsonify(error="Not logged in."), 401
+    try:
+        limit = min(int(request.args.get('limit', CHAT_PAGE_SIZE)), 200)
+        messages, cursor = load_chat_page(get_db(), session['emp_id'], request.args.get('before'), limit)
+    except ValueError:
+        return jsonify(error="Invalid cursor or limit."), 400
+    return jsonify(messages=[{'role': m.role, 'message': m.message, 'ts': m.ts} for m in messages],
+                   next_cursor=cursor)
 
 @app.route('/applicant_chat', methods=['POST'])
 def applicant_chat_post():
-    emp_id = session['emp_id']
-    user_msg = request.form['message']
-    c.execute("INSERT INTO chat VALUES (?,?,?,?)", (emp_id, 'user', user_msg, datetime.datetime.now().isoformat()))
-    reply = "Available Roles:\n• " + "\n• ".join(JOB_ROLES) if "job" in user_msg.lower() else \
-            "Openings: 3+ roles." if "vacanc" in user_msg.lower() else \
-            "Guidelines:\n• 30 days leave\n• Hybrid work" if "guide" in user_msg.lower() else \
-            "Choose: Job roles, Vacancies, Guidelines."
-    c.execute("INSERT INTO chat VALUES (?,?,?,?)", (emp_id, 'bot', reply, datetime.datetime.now().isoformat()))
-    conn.commit()
+    applicant_chat_turn(get_db(), session['emp_id'], request.form['message'])
     return redirect(url_for('applicant_portal'))
 
+def _chat_message():
+    payload = request.get_json(silent=True)
+    message = payload.get('message') if isinstance(payload, dict) else request.form.get('message')
+    return message.strip() if isinstance(message, str) else ''
+
+# JSON chat: one transaction, and only the new user/bot pair comes back for the page to append
+@app.route('/api/chat', methods=['POST'])
+def api_chat():
+    if 'emp_id' not in session:
+        return jsonify(error="Not logged in."), 401
+    message = _chat_message()
+    if not message:
+        return jsonify(error="Message is required."), 400
+    return jsonify(messages=employee_chat_turn(get_db(), session['emp_id'], message))
+
+@app.route('/api/applicant_chat', methods=['POST'])
+def api_applicant_chat():
+    if 'emp_id' not in session:
+        return jsonify(error="Session expired."), 401
+    message = _chat_message()
+    if not message:
+        return jsonify(error="Message is required."), 400
+    return jsonify(messages=applicant_chat_turn(get_db(), session['emp_id'], message))
+
 @app.route('/submit_application', methods=['POST'])
 def submit_application():
+    db = get_db()
+    c = db.cursor()
     try:
         name = request.form['name'].strip()
         designation = request.form['designation'].strip()
@@ -739,7 +2744,7 @@ def submit_application():
             return redirect(url_for('applicant_portal'))
         c.execute("INSERT INTO applications (name, designation, experience, role, ts) VALUES (?,?,?,?,?)",
                   (name, designation, experience, role, datetime.datetime.now().isoformat()))
-        conn.commit()
+        db.commit()
         append_applicant_row({'name': name, 'designation': designation, 'experience': experience, 'role': role, 'ts': datetime.datetime.now().isoformat()})
         flash(f"Application for {role} submitted.")
     except Exception:
@@ -748,15 +2753,24 @@ def submit_application():
 
 @app.route('/save_profile', methods=['POST'])
 def save_profile():
+    db = get_db()
+    c = db.cursor()
     try:
         data = request.form
         emp_id = data['emp_id']
+        # Sentiment is scored only when the feedback text actually changes
+        stored = c.execute("SELECT feedback, feedback_sentiment FROM employee WHERE id=?", (emp_id,)).fetchone()
+        if stored and stored[0] == data['feedback'] and stored[1] is not None:
+            sentiment = stored[1]
+        else:
+            sentiment = feedback_sentiment(data['feedback'])
         c.execute('''INSERT OR REPLACE INTO employee 
-                     (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, password_hash)
-                     SELECT id, ?, ?, ?, ?, ?, ?, ?, leaves_taken, password_hash FROM employee WHERE id=?''',
+                     (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, password_hash, feedback_sentiment)
+                     SELECT id, ?, ?, ?, ?, ?, ?, ?, leaves_taken, password_hash, ? FROM employee WHERE id=?''',
                   (data['name'], int(data['age']), int(data['income']), int(data['sat']),
-                   data['overtime'], int(data['involve']), data['feedback'], emp_id))
-        conn.commit()
+                   data['overtime'], int(data['involve']), data['feedback'], sentiment, emp_id))
+        bump_dashboard_version(db, emp_id, 'profile')
+        db.commit()
 
         leaves_taken = c.execute("SELECT leaves_taken FROM employee WHERE id=?", (emp_id,)).fetchone()[0]
         append_employee_row({
@@ -768,57 +2782,330 @@ def save_profile():
         attrition, attrition_prob, promotion, promotion_prob = predict({
             'Age': int(data['age']), 'MonthlyIncome': int(data['income']),
             'JobSatisfaction': int(data['sat']), 'OverTime': data['overtime'],
-            'JobInvolvement': int(data['involve']), 'Feedback': data['feedback']
+            'JobInvolvement': int(data['involve']), 'Feedback': data['feedback'],
+            'FeedbackSentiment': sentiment
         })
+        record_risk(db, emp_id, attrition_prob, promotion_prob, registry.get().version)
+        db.commit()
+        factors = top_factors(explain({
+            'Age': int(data['age']), 'MonthlyIncome': int(data['income']),
+            'JobSatisfaction': int(data['sat']), 'OverTime': data['overtime'],
+            'JobInvolvement': int(data['involve']), 'FeedbackSentiment': sentiment
+        }))
 
         session['results'] = {
             'attrition': attrition, 'attrition_prob': attrition_prob,
-            'promotion': promotion, 'promotion_prob': promotion_prob
+            'promotion': promotion, 'promotion_prob': promotion_prob,
+            'factors': factors
         }
         flash("Profile saved and predictions generated.")
     except Exception as e:
         flash(f"Error: {str(e)}")
     return redirect(url_for('employee_dashboard'))
 
+def _batch_frame():
+    # Accepts a JSON list (or {"employees": [...]}) or a CSV upload / text/csv body.
+    # Keys are model inputs (Age, MonthlyIncome, ..., OverTime, Feedback); missing ones use DEFAULTS.
+    # Returns (df, None) or (None, error response).
+    try:
+        if 'file' in request.files:
+            df = pd.read_csv(request.files['file'], nrows=MAX_BATCH_ROWS + 1)
+        elif request.mimetype == 'text/csv':
+            df = pd.read_csv(io.BytesIO(request.get_data()), nrows=MAX_BATCH_ROWS + 1)
+        else:
+            payload = request.get_json(silent=True)
+            rows = payload.get('employees') if isinstance(payload, dict) else payload
+            if not isinstance(rows, list):
+                return None, (jsonify(error="Expected a JSON list of employees or a CSV file."), 400)
+            df = pd.DataFrame(rows)
+    except Exception as e:
+        return None, (jsonify(error=f"Could not parse input: {e}"), 400)
+    if len(df) > MAX_BATCH_ROWS:
+        return None, (jsonify(error=f"At most {MAX_BATCH_ROWS} rows per request."), 413)
+    return df, None
+
+@app.route('/api/predict_batch', methods=['POST'])
+def api_predict_batch():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    df, error = _batch_frame()
+    if error:
+        return error
+
+    try:
+        results = predict_batch(df)
+    except RuntimeError as e:
+        return jsonify(error=str(e)), 503
+    if 'emp_id' in df:
+        results.insert(0, 'emp_id', df['emp_id'].astype(object).where(df['emp_id'].notna(), None))
+
+    if request.args.get('format') == 'csv':
+        return Response(results.to_csv(index=False), mimetype='text/csv')
+    return jsonify(predictions=results.to_dict(orient='records'))
+
+@app.route('/api/whatif', methods=['POST'])
+def api_whatif():
+    # {"grid": {"MonthlyIncome": {"scale": [1, 1.1, 1.2, 1.3, 1.4]}, "OverTime": ["Yes", "No"]},
+    #  "profile": {...optional input overrides}, "emp_id": ...admin only}
+    # Employees simulate their own profile; admins may pass any emp_id.
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('grid', {}), dict):
+        return jsonify(error="Expected a JSON object with a 'grid' of overrides."), 400
+    if not isinstance(payload.get('profile') or {}, dict):
+        return jsonify(error="'profile' must be an object of input overrides."), 400
+    emp_id = payload.get('emp_id') if is_admin_request() else session.get('emp_id')
+    if emp_id is None and not is_admin_request():
+        return jsonify(error="Not logged in."), 401
+
+    features = {}
+    if emp_id is not None:
+        row = get_db().execute(EMPLOYEE_SELECT, (emp_id,)).fetchone()
+        if row is None:
+            return jsonify(error="Employee not found."), 404
+        profile = dict(zip(EMPLOYEE_COLUMNS, row))
+        features = {name: profile[col] for col, name in EMPLOYEE_FEATURE_MAP.items() if profile.get(col) is not None}
+    features.update(payload.get('profile') or {})
+    try:
+        result = whatif(features, payload.get('grid') or {})
+    except (ValueError, TypeError) as e:
+        return jsonify(error=str(e)), 400
+    except RuntimeError as e:
+        return jsonify(error=str(e)), 503
+    return jsonify(dict(result, emp_id=emp_id))
+
+@app.route('/api/explain', methods=['POST'])
+def api_explain():
+    # Same input as /api/predict_batch; one explanation per row
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    df, error = _batch_frame()
+    if error:
+        return error
+    try:
+        explanations = explain_batch(df)
+    except RuntimeError as e:
+        return jsonify(error=str(e)), 503
+    if 'emp_id' in df:
+        for emp_id, explanation in zip(df['emp_id'].astype(object).where(df['emp_id'].notna(), None), explanations):
+            explanation['emp_id'] = emp_id
+    return jsonify(explanations=explanations)
+
+@app.route('/api/reports', methods=['POST'])
+def api_submit_report():
+    if 'emp_id' not in session:
+        return jsonify(error="Not logged in."), 401
+    emp_id = session['emp_id']
+    db = get_db()
+    profile = db.execute(EMPLOYEE_SELECT, (emp_id,)).fetchone()
+    if not profile:
+        return jsonify(error="Profile not found."), 404
+    tasks = db.execute("SELECT task, status FROM task WHERE emp_id=?", (emp_id,)).fetchall()
+    job_id = submit_report_job(emp_id, dict(zip(EMPLOYEE_COLUMNS, profile)), session.get('results', {}), tasks)
+    if job_id is None:
+        return jsonify(error="Too many report jobs in flight, try again shortly."), 503
+    return jsonify(job_id=job_id, status='queued', status_url=url_for('api_report_status', job_id=job_id)), 202
+
+@app.route('/api/reports/bulk', methods=['POST'])
+def api_bulk_reports():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+
+    def stream():
+        t0 = time.perf_counter()
+        buf = _ChunkBuffer()
+        count = 0
+        for count in write_bulk_reports(buf, request.args.get('workers', type=int)):
+            data = buf.drain()
+            if data:
+                yield data
+        yield buf.drain()
+        elapsed = time.perf_counter() - t0
+        print(f"Bulk reports: {count} in {elapsed:.1f}s ({count / elapsed:.1f} reports/s)", file=sys.stderr)
+
+    return Response(stream_with_context(stream()), mimetype='application/zip',
+                    headers={'Content-Disposition': f"attachment; filename=HR_Reports_{datetime.datetime.now().strftime('%Y%m%d')}.zip"})
+
+@app.route('/api/reports/<job_id>')
+def api_report_status(job_id):
+    job = get_report_job(job_id, session.get('emp_id'))
+    if job is None:
+        return jsonify(error="Unknown report job."), 404
+    body = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        body['download_url'] = url_for('api_report_download', job_id=job_id)
+    return jsonify(body)
+
+@app.route('/api/reports/<job_id>/download')
+def api_report_download(job_id):
+    job = get_report_job(job_id, session.get('emp_id'), with_pdf=True)
+    if job is None or job['status'] != 'done':
+        return jsonify(error="Report not ready."), 404
+    return send_file(io.BytesIO(job['pdf']), as_attachment=True, mimetype='application/pdf',
+                     download_name=f"HR_Report_{job['emp_id']}_{datetime.datetime.now().strftime('%Y%m%d')}.pdf")
+
+# -------------------------- Dashboard API --------------------------
+# Each panel's strong ETag comes from its dashboard_version counter, so an
+# unchanged panel is answered 304 after one primary-key lookup, without
+# reading tasks or chat. Predictions live in the session, so their ETag
+# is a hash of the session results.
+DASHBOARD_PANELS = ('profile', 'tasks', 'chat')
+PROFILE_FIELDS = ('name', 'age', 'income', 'sat', 'overtime', 'involve', 'feedback', 'leaves_taken')
+
+def _panel_etag(emp_id, panel, version):
+    return hashlib.sha1(f"{emp_id}:{panel}:{version}".encode('utf-8')).hexdigest()[:20]
+
+def _predictions_etag(results):
+    return hashlib.sha1(json.dumps(results, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+
+def _dashboard_etags(db, emp_id):
+    versions = dict(db.execute("SELECT panel, version FROM dashboard_version WHERE emp_id=?", (emp_id,)).fetchall())
+    etags = {panel: _panel_etag(emp_id, panel, versions.get(panel, 0)) for panel in DASHBOARD_PANELS}
+    etags['predictions'] = _predictions_etag(session.get('results', {}))
+    return etags
+
+def _panel_data(db, emp_id, panel):
+    if panel == 'profile':
+        row = db.execute(EMPLOYEE_SELECT, (emp_id,)).fetchone()
+        profile = dict(zip(EMPLOYEE_COLUMNS, row)) if row else {}
+        return {field: profile.get(field) for field in PROFILE_FIELDS}
+    if panel == 'tasks':
+        tasks = [TaskRow(*r) for r in db.execute("SELECT task, status FROM task WHERE emp_id=?", (emp_id,))]
+        done = sum(1 for t in tasks if t.status == 'Done')
+        return {'tasks': [t._asdict() for t in tasks], 'done': done, 'pending': len(tasks) - done}
+    if panel == 'chat':
+        messages, cursor = load_chat_page(db, emp_id)
+        return {'messages': [{'role': m.role, 'message': m.message, 'ts': m.ts} for m in messages],
+                'next_cursor': cursor}
+    return session.get('results', {})
+
+def _conditional_json(etag, build):
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(build())
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    if 'emp_id' not in session:
+        return jsonify(error="Not logged in."), 401
+    etags = _dashboard_etags(get_db(), session['emp_id'])
+    overall = hashlib.sha1(json.dumps(etags, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+    return _conditional_json(overall, lambda: {
+        'panels': {panel: {'etag': etag, 'url': url_for('api_dashboard_panel', panel=panel)}
+                   for panel, etag in etags.items()}})
+
+@app.route('/api/dashboard/<panel>')
+def api_dashboard_panel(panel):
+    if 'emp_id' not in session:
+        return jsonify(error="Not logged in."), 401
+    if panel not in DASHBOARD_PANELS and panel != 'predictions':
+        return jsonify(error="Unknown panel."), 404
+    db = get_db()
+    emp_id = session['emp_id']
+    if panel == 'predictions':
+        etag = _predictions_etag(session.get('results', {}))
+    else:
+        row = db.execute("SELECT version FROM dashboard_version WHERE emp_id=? AND panel=?", (emp_id, panel)).fetchone()
+        etag = _panel_etag(emp_id, panel, row[0] if row else 0)
+    return _conditional_json(etag, lambda: _panel_data(db, emp_id, panel))
+
+@app.route('/api/render_stats')
+def api_render_stats():
+    with _render_stats_lock:
+        return jsonify({name: dict(stats, avg_ms=stats['total_ms'] / stats['count'])
+                        for name, stats in TEMPLATE_RENDER_STATS.items()})
+
+@app.route('/api/password_stats')
+def api_password_stats():
+    return jsonify(password_stats())
+
+@app.route('/api/export_status')
+def api_export_status():
+    return jsonify(export_worker.stats())
+
+def _metric(name, kind, doc, samples):
+    # samples: [(labels dict, value)]
+    lines = [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        pairs = _label_pairs(labels.keys(), labels.values())
+        lines.append(f"{name}{{{pairs}}} {value}" if pairs else f"{name} {value}")
+    return lines
+
+def render_metrics():
+    lines = []
+    for histogram in (REQUEST_SECONDS, STAGE_SECONDS, SQLITE_SECONDS):
+        lines += histogram.render()
+    caches = [('prediction', prediction_cache.stats()), ('sentiment', sentiment_cache.stats()), ('chart', chart_cache.stats())]
+    for field, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'), ('size', 'gauge')):
+        suffix = '_total' if kind == 'counter' else ''
+        lines += _metric(f'hr_cache_{field}{suffix}', kind, f"Cache {field}.",
+                         [({'cache': name}, stats[field]) for name, stats in caches])
+    export = export_worker.stats()
+    lines += _metric('hr_export_queue_depth', 'gauge', "Rows waiting for the export worker.", [({}, export['queue_depth'])])
+    for field in ('flushes', 'rows_written', 'overflows', 'errors'):
+        lines += _metric(f'hr_export_{field}_total', 'counter', f"Export worker {field}.", [({}, export[field])])
+    with _render_stats_lock:
+        renders = [(name, dict(stats)) for name, stats in TEMPLATE_RENDER_STATS.items()]
+    lines += _metric('hr_template_renders_total', 'counter', "Template renders.",
+                     [({'template': name}, stats['count']) for name, stats in renders])
+    lines += _metric('hr_template_render_seconds_max', 'gauge', "Slowest template render.",
+                     [({'template': name}, stats['max_ms'] / 1000) for name, stats in renders])
+    with _password_stats_lock:
+        rehashed, rejected = PASSWORD_STATS['rehashed'], PASSWORD_STATS['rejected']
+    lines += _metric('hr_password_rehashed_total', 'counter', "Hashes upgraded to the current bcrypt cost.", [({}, rehashed)])
+    lines += _metric('hr_password_rejected_total', 'counter', "Password jobs rejected by a full pool.", [({}, rejected)])
+    lines += _metric('hr_lazy_import_seconds', 'gauge', "Time spent importing each lazily loaded module.",
+                     [({'module': name}, seconds) for name, seconds in sorted(LAZY_IMPORT_SECONDS.items())])
+    lines += _metric('hr_boot_seconds', 'gauge', "Import-to-ready time of this process.", [({}, BOOT_SECONDS)])
+    m = registry.current
+    lines += _metric('hr_model_info', 'gauge', "Loaded model bundle.", [({'version': m.version}, 1)] if m else [])
+    return '\n'.join(lines) + '\n'
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/add_task', methods=['POST'])
 def add_task():
+    db = get_db()
+    c = db.cursor()
     c.execute("INSERT INTO task VALUES (?,?,?,?)",
               (request.form['emp_id'], request.form['task'], "Pending", datetime.datetime.now().isoformat()))
-    conn.commit()
+    bump_dashboard_version(db, request.form['emp_id'], 'tasks')
+    db.commit()
     return redirect(url_for('employee_dashboard'))
 
 @app.route('/complete_task', methods=['POST'])
 def complete_task():
+    db = get_db()
+    c = db.cursor()
     c.execute("UPDATE task SET status='Done' WHERE emp_id=? AND task=?", 
               (request.form['emp_id'], request.form['task']))
-    conn.commit()
+    bump_dashboard_version(db, request.form['emp_id'], 'tasks')
+    db.commit()
     return redirect(url_for('employee_dashboard'))
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    emp_id = request.form['emp_id']
-    user_msg = request.form['message']
-    c.execute("INSERT INTO chat VALUES (?,?,?,?)", (emp_id, 'user', user_msg, datetime.datetime.now().isoformat()))
-    c.execute("SELECT name, leaves_taken FROM employee WHERE id=?", (emp_id,))
-    row = c.fetchone()
-    name = row[0] if row else "Employee"
-    leaves = row[1] if row else 0
-    bot_reply = get_employee_bot_response(name, leaves, user_msg)
-    c.execute("INSERT INTO chat VALUES (?,?,?,?)", (emp_id, 'bot', bot_reply, datetime.datetime.now().isoformat()))
-    conn.commit()
+    employee_chat_turn(get_db(), request.form['emp_id'], request.form['message'])
     return redirect(url_for('employee_dashboard'))
 
 @app.route('/download_pdf', methods=['POST'])
 def download_pdf():
+    db = get_db()
+    c = db.cursor()
     try:
         emp_id = request.form['emp_id']
-        c.execute("SELECT * FROM employee WHERE id=?", (emp_id,))
+        c.execute(EMPLOYEE_SELECT, (emp_id,))
         profile = c.fetchone()
         if not profile:
             flash("Profile not found.")
             return redirect(url_for('employee_dashboard'))
 
-        profile_dict = dict(zip(['id','name','age','income','sat','overtime','involve','feedback','leaves_taken','password_hash'], profile))
+        profile_dict = dict(zip(EMPLOYEE_COLUMNS, profile))
         c.execute("SELECT task, status FROM task WHERE emp_id=?", (emp_id,))
         tasks = c.fetchall()
         results = session.get('results', {})
@@ -839,7 +3126,321 @@ def download_pdf():
         print("CRITICAL PDF ERROR:", traceback.format_exc())
         return redirect(url_for('employee_dashboard'))
 
+@app.route('/api/risk/summary')
+def api_risk_summary():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    return jsonify(risk_summary(get_db()))
+
+@app.route('/api/risk/top')
+def api_risk_top():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    k = min(request.args.get('k', RISK_TOP_K, type=int), RISK_TOP_K)
+    return jsonify(employees=top_at_risk(get_db(), max(k, 1)))
+
+@app.route('/api/import', methods=['POST'])
+def api_import():
+    # multipart upload field "file": IBM HR attrition CSV or XLSX
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(error="Upload a CSV or XLSX file as 'file'."), 400
+    if not secure_filename(upload.filename).lower().endswith(('.csv', '.xlsx', '.xlsm')):
+        return jsonify(error="Upload a CSV or XLSX file as 'file'."), 400
+    try:
+        chunk_size = max(1, min(int(request.args.get('chunk_size', IMPORT_CHUNK)), 100000))
+    except ValueError:
+        return jsonify(error="chunk_size must be an integer."), 400
+    job_id = submit_import(upload, chunk_size)
+    return jsonify(job_id=job_id, status='queued', status_url=url_for('api_import_status', job_id=job_id)), 202
+
+@app.route('/api/import/<job_id>')
+def api_import_status(job_id):
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    job = get_import_job(job_id)
+    if job is None:
+        return jsonify(error="Unknown import job."), 404
+    return jsonify(job)
+
+@app.route('/api/outcomes', methods=['POST'])
+def api_outcomes():
+    # [{"emp_id": ..., "attrited": "Yes"/"No"/1/0, "promoted": ...}, ...]
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    payload = request.get_json(silent=True)
+    outcomes = payload.get('outcomes') if isinstance(payload, dict) else payload
+    if not isinstance(outcomes, list) or not all(isinstance(o, dict) and {'emp_id', 'attrited', 'promoted'} <= o.keys()
+                                                 for o in outcomes):
+        return jsonify(error="Expected a list of {emp_id, attrited, promoted}."), 400
+    return jsonify(recorded=record_outcomes(get_db(), outcomes))
+
+@app.route('/api/models')
+def api_models():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    m = registry.current
+    with _retrain_status_lock:
+        status = dict(RETRAIN_STATUS)
+    return jsonify(version=m.version if m else None, load_seconds=registry.load_seconds, retrain=status)
+
+@app.route('/api/models/retrain', methods=['POST'])
+def api_models_retrain():
+    if not is_admin_request():
+        return jsonify(error="Admin token required."), 403
+    if not submit_retrain():
+        return jsonify(error="Retraining already running."), 409
+    return jsonify(state='queued', status_url=url_for('api_models')), 202
+
+# -------------------------- Benchmarks --------------------------
+# `flask --app app bench --rows 100000 --out bench.json` seeds a separate
+# database from synthetic_employees() and times the hot paths and the
+# routes (through the test client). Reuse a seeded --db across runs and
+# commits to skip seeding. The export journal and workbook go to a temp dir.
+BENCH_FEEDBACK = ['', 'I love my team', 'Too much overtime, feeling burnt out', 'It is okay',
+                  'Great manager and room to grow', 'Pay is low and the work is stressful']
+BENCH_TASKS_PER_EMPLOYEE = 3
+BENCH_CHUNK = 10000
+
+def seed_bench_db(db, rows, chunk_size=BENCH_CHUNK):
+    polarity = {text: textblob.TextBlob(text).sentiment.polarity for text in BENCH_FEEDBACK}
+    for table in ('employee', 'task', 'chat', 'applications', 'dashboard_version', 'employee_risk', 'risk_bucket'):
+        db.execute(f"DELETE FROM {table}")
+    db.commit()
+    now = datetime.datetime.now().isoformat()
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        df = synthetic_employees(n, seed=start)
+        ids = [f"b{start + i}" for i in range(n)]
+        feedback = [BENCH_FEEDBACK[(start + i) % len(BENCH_FEEDBACK)] for i in range(n)]
+        db.executemany('''INSERT INTO employee (id, name, age, income, sat, overtime, involve, feedback, leaves_taken, feedback_sentiment)
+                          VALUES (?,?,?,?,?,?,?,?,?,?)''',
+                       ((emp_id, f"Employee {emp_id}", int(age), int(income), int(sat), overtime, int(involve), text,
+                         i % 25, polarity[text])
+                        for i, (emp_id, age, income, sat, overtime, involve, text) in enumerate(zip(
+                            ids, df['Age'], df['MonthlyIncome'], df['JobSatisfaction'], df['OverTime'],
+                            df['JobInvolvement'], feedback))))
+        db.executemany("INSERT INTO task VALUES (?,?,?,?)",
+                       ((emp_id, f"Task {k + 1}", 'Done' if (i + k) % 3 == 0 else 'Pending', now)
+                        for i, emp_id in enumerate(ids) for k in range(BENCH_TASKS_PER_EMPLOYEE)))
+        db.executemany("INSERT INTO chat VALUES (?,?,?,?)",
+                       ((emp_id, role, message, now) for emp_id in ids for role, message in
+                        (('user', 'How many leaves do I have?'), ('bot', 'You have taken some leaves.'))))
+        db.executemany("INSERT INTO applications (name, designation, experience, role, ts) VALUES (?,?,?,?,?)",
+                       ((f"Applicant {start + i}", 'Engineer', f"{i % 15} years", JOB_ROLES[i % len(JOB_ROLES)], now)
+                        for i in range(0, n, 10)))
+        db.commit()
+
+def _bench(fn, inputs, setup=None):
+    fn(inputs[0])  # warm-up
+    samples = []
+    elapsed = 0.0
+    for item in inputs:
+        if setup is not None:
+            setup(item)
+        t0 = time.perf_counter()
+        fn(item)
+        took = time.perf_counter() - t0
+        elapsed += took
+        samples.append(took * 1000)
+    return dict(_percentiles(samples), seconds=round(elapsed, 4), ops_per_sec=round(len(samples) / elapsed, 1))
+
+def _ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+    return response
+
+def run_benchmarks(rows, iterations, db_path=None, reseed=False):
+    global DB, EXPORT_JOURNAL, EXCEL_FILE, _background_pid
+    workdir = tempfile.mkdtemp(prefix='hr-bench-')
+    DB = db_path or os.path.join(workdir, 'bench.db')
+    EXPORT_JOURNAL = os.path.join(workdir, 'hr_data.journal.jsonl')
+    EXCEL_FILE = os.path.join(workdir, 'hr_data.xlsx')
+    _db_local.pid = None
+    init_db()
+    db = get_db()
+
+    seed_seconds = None
+    if reseed or db.execute("SELECT COUNT(*) FROM employee").fetchone()[0] != rows:
+        t0 = time.perf_counter()
+        seed_bench_db(db, rows)
+        seed_seconds = round(time.perf_counter() - t0, 2)
+
+    # Only the export worker. Claiming _background_pid keeps the test-client requests below
+    # from starting the compactor, model watcher and chart warm-up, which would skew the timings.
+    _background_pid = os.getpid()
+    export_worker.start()
+    rng = np.random.default_rng(0)
+    ids = [f"b{i}" for i in rng.integers(0, rows, iterations)]
+    profiles = {row[0]: dict(zip(EMPLOYEE_COLUMNS, row))
+                for row in db.execute(f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employee WHERE id IN (SELECT value FROM json_each(?))",
+                                      (json.dumps(ids),))}
+    features = [{'Age': p['age'], 'MonthlyIncome': p['income'], 'JobSatisfaction': p['sat'], 'OverTime': p['overtime'],
+                 'JobInvolvement': p['involve'], 'Feedback': p['feedback'], 'FeedbackSentiment': p['feedback_sentiment']}
+                for p in (profiles[emp_id] for emp_id in ids)]
+    registry.get()
+    client = app.test_client()
+
+    def login(emp_id):
+        with client.session_transaction() as sess:
+            sess['emp_id'] = emp_id
+
+    def pdf_inputs(emp_id):
+        p = profiles[emp_id]
+        results = dict(zip(('attrition', 'attrition_prob', 'promotion', 'promotion_prob'), predict(features[ids.index(emp_id)])))
+        tasks = db.execute("SELECT task, status FROM task WHERE emp_id=?", (emp_id,)).fetchall()
+        return p, results, tasks
+
+    results = {}
+    prediction_cache.clear()
+    results['predict'] = _bench(predict, features, setup=lambda f: prediction_cache.clear())
+    # Fill the cache untimed (the cold pass above cleared it before every call), then time hits
+    for f in features:
+        predict(f)
+    hits, misses = prediction_cache.hits, prediction_cache.misses
+    results['predict_cached'] = _bench(predict, features)
+    hits, misses = prediction_cache.hits - hits, prediction_cache.misses - misses
+    results['predict_cached']['hit_rate'] = round(hits / (hits + misses), 3) if hits + misses else None
+    pdf_args = {emp_id: pdf_inputs(emp_id) for emp_id in set(ids)}
+    # Fill the chart cache first, as a serving worker's warm-up would, so generate_pdf times
+    # the steady state rather than first renders
+    warm_chart_cache()
+    results['generate_pdf'] = _bench(lambda emp_id: generate_pdf(emp_id, *pdf_args[emp_id]), ids)
+    results['append_employee_row'] = _bench(
+        lambda emp_id: append_employee_row({**{k: profiles[emp_id][k] for k in EXPORT_SHEETS['Employees'][1:-1]},
+                                            'emp_id': emp_id, 'ts': datetime.datetime.now().isoformat()}), ids)
+    results['dashboard'] = _bench(lambda emp_id: _ok(client.get('/employee/dashboard')), ids, setup=login)
+    results['chat'] = _bench(lambda emp_id: _ok(client.post('/chat', data={'emp_id': emp_id, 'message': 'How many leaves do I have?'})), ids)
+    results['applicant_chat'] = _bench(lambda emp_id: _ok(client.post('/applicant_chat', data={'message': 'Any job openings?'})),
+                                       ids, setup=lambda emp_id: login('applicant_' + emp_id))
+    export_worker.stop()
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'meta': {'commit': commit, 'timestamp': datetime.datetime.now().isoformat(), 'python': sys.version.split()[0],
+                 'rows': rows, 'iterations': iterations, 'model_version': registry.get().version, 'db': DB},
+        'seed_seconds': seed_seconds,
+        'benchmarks': results,
+    }
+
+@app.cli.command('bench')
+@click.option('--rows', default=1000, help='Employees to seed (1k to 1M)')
+@click.option('-n', 'iterations', default=200, help='Timed calls per benchmark')
+@click.option('--db', 'db_path', default=None, help='Benchmark database, reseeded when its size differs (default: temp file)')
+@click.option('--reseed', is_flag=True, help='Reseed even if --db already has --rows employees')
+@click.option('--out', default='-', help="JSON destination, '-' for stdout")
+def bench_command(rows, iterations, db_path, reseed, out):
+    report = run_benchmarks(rows, iterations, db_path, reseed)
+    text = json.dumps(report, indent=2)
+    if out == '-':
+        print(text)
+    else:
+        with open(out, 'w') as f:
+            f.write(text + '\n')
+    for name, stats in report['benchmarks'].items():
+        print(f"{name:20s} {stats['ops_per_sec']:>10.1f} ops/s  p50 {stats['p50']:.2f} ms  p99 {stats['p99']:.2f} ms", file=sys.stderr)
+
+# -------------------------- Startup --------------------------
+# Background threads only run in serving processes, each starting its own on
+# its first request (threads do not survive fork()). Importing the module
+# starts none, so `flask <command>` runs and a `gunicorn --preload` master
+# never fork or time anything while a warm-up thread holds a lock.
+PRELOAD = os.environ.get('HR_PRELOAD', '0') == '1'
+_background_pid = None
+
+def start_background_workers():
+    global _background_pid, export_worker, report_pool, password_pool, retrain_pool, import_pool
+    if _background_pid == os.getpid():
+        return
+    if _background_pid is not None:
+        # Forked child: the parent's queue and pools belong to threads that no longer exist
+        export_worker = ExportWorker(EXPORT_QUEUE_SIZE, EXPORT_FLUSH_INTERVAL)
+        report_pool = concurrent.futures.ThreadPoolExecutor(REPORT_WORKERS, thread_name_prefix='report')
+        password_pool = concurrent.futures.ThreadPoolExecutor(PASSWORD_WORKERS, thread_name_prefix='bcrypt')
+        retrain_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='retrain')
+        import_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='import')
+    _background_pid = os.getpid()
+    export_worker.start()
+    atexit.register(export_worker.stop)
+    if EXPORT_COMPACT_INTERVAL > 0:
+        threading.Thread(target=_export_compactor, name='export-compactor', daemon=True).start()
+    if MODEL_POLL_INTERVAL > 0:
+        threading.Thread(target=_model_watcher, name='model-watcher', daemon=True).start()
+    if RETRAIN_INTERVAL > 0:
+        threading.Thread(target=_retrainer, name='retrainer', daemon=True).start()
+    if CHART_WARMUP and not PRELOAD:
+        threading.Thread(target=warm_chart_cache, name='chart-warmup', daemon=True).start()
+
+@app.before_request
+def _ensure_background_workers():
+    start_background_workers()
+
+def preload():
+    # For `HR_PRELOAD=1 gunicorn --preload app:app`: import, load and render everything in
+    # the master so forked workers share those pages copy-on-write
+    for module in LAZY_MODULES:
+        module._load()
+    try:
+        registry.get()
+    except RuntimeError as e:
+        print(f"WARNING: {e}", file=sys.stderr)
+    if CHART_WARMUP:
+        warm_chart_cache()
+
+if PRELOAD:
+    preload()
+
+BOOT_SECONDS = time.perf_counter() - _BOOT_T0
+print(f"Startup completed in {BOOT_SECONDS * 1000:.0f} ms", file=sys.stderr)
+
+@app.cli.command('import-profile')
+@click.option('--top', default=15, help='Number of slowest direct imports to list')
+@click.option('--preload', is_flag=True, help='Profile with HR_PRELOAD=1 (everything imported eagerly)')
+@click.option('--json', 'as_json', is_flag=True, help='Emit machine-readable JSON')
+def import_profile_command(top, preload, as_json):
+    # Cold-start cost of `import app` in a fresh interpreter, measured with python -X importtime
+    env = dict(os.environ, HR_CHART_WARMUP='0', HR_PRELOAD='1' if preload else '0')
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], capture_output=True, text=True,
+                          env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - t0
+
+    entries = []  # (indent, module, cumulative us) in the order -X importtime prints them (children first)
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative_us)))
+    app_idx = next((i for i, e in enumerate(entries) if e[1] == 'app'), None)
+    direct = []
+    if app_idx is not None:
+        indent = entries[app_idx][0]
+        for e in reversed(entries[:app_idx]):
+            if e[0] <= indent:
+                break
+            if e[0] == indent + 2:
+                direct.append(e)
+    direct.sort(key=lambda e: -e[2])
+
+    report = {
+        'wall_ms': round(wall * 1000, 1),
+        'app_import_ms': round(entries[app_idx][2] / 1000, 1) if app_idx is not None else None,
+        'slowest_imports_ms': {name: round(us / 1000, 1) for _, name, us in direct[:top]},
+    }
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Interpreter start + import app: {report['wall_ms']:.0f} ms (import app: {report['app_import_ms']} ms)")
+    for name, ms in report['slowest_imports_ms'].items():
+        print(f"  {ms:9.1f} ms  {name}")
+
 # -------------------------- Run --------------------------
 if __name__ == '__main__':
+    start_background_workers()
     print("HR Insight Bot → http://127.0.0.1:5000")
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file